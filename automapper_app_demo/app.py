@@ -3,9 +3,25 @@ os.environ["STREAMLIT_SERVER_FILE_WATCHER_TYPE"] = "none"
 
 import streamlit as st
 import pandas as pd
+import logging
 from utils.interface_utils import display_mapper_interface
+from utils.file_processor import warm_up_predictor
+from utils.session_memory import enable_copy_on_write
 
 st.set_page_config(layout="wide")
+enable_copy_on_write()
+
+logger = logging.getLogger(__name__)
+
+@st.cache_resource(show_spinner="Loading mapping model...")
+def warm_up_model():
+    """Load the mapping model once per server process, shared by all sessions"""
+    try:
+        warm_up_predictor()
+        return True
+    except Exception as e:
+        logger.warning(f"Model warm-up failed, it will be loaded on first upload: {str(e)}")
+        return False
 
 def initialize_session_state():
     """Initialize session state variables"""
@@ -20,6 +36,7 @@ def initialize_session_state():
 
 def main():
     initialize_session_state()
+    warm_up_model()
     display_mapper_interface()
 
 if __name__ == "__main__":
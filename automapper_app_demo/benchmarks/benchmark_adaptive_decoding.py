@@ -0,0 +1,59 @@
+"""Compare adaptive decoding (greedy, beams only for low-confidence rows) against beam search.
+
+Reports throughput, the share of rows re-run with beams and field agreement
+with beam search at each confidence threshold.
+
+Usage (from automapper_app_demo/):
+    python benchmarks/benchmark_adaptive_decoding.py --rows 512
+    python benchmarks/benchmark_adaptive_decoding.py --input plan.csv --thresholds 0.5 0.8 0.9
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from utils.file_processor import PlacementPredictor, CONFIDENCE_FIELD
+from benchmark_batching import synthetic_prompts, file_prompts
+
+FIELDS = ['Placement Group', 'Publisher', 'Tactic', 'Audience', 'Ad Type']
+
+def run(predictor, prompts):
+    start = time.perf_counter()
+    predictions = predictor.predict(prompts)
+    return predictions, len(prompts) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', default=os.getenv('MODEL_DIR', './model_outputs'))
+    parser.add_argument('--input', help="CSV with Campaign and Placement Name columns")
+    parser.add_argument('--rows', type=int, default=512)
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.5, 0.7, 0.8, 0.9])
+    args = parser.parse_args()
+
+    predictor = PlacementPredictor(args.model_dir, device=torch.device('cpu'))
+    prompts = file_prompts(predictor, args.input) if args.input else synthetic_prompts(predictor, args.rows)
+
+    predictor.decoding = 'beam'
+    beam_preds, beam_rate = run(predictor, prompts)
+    print(f"beam search:        {beam_rate:8.1f} rows/s")
+
+    predictor.decoding = 'adaptive'
+    predictor.confidence_threshold = 0.0  # never re-run: plain greedy
+    greedy_preds, greedy_rate = run(predictor, prompts)
+    print(f"greedy:             {greedy_rate:8.1f} rows/s")
+
+    for threshold in args.thresholds:
+        predictor.confidence_threshold = threshold
+        preds, rate = run(predictor, prompts)
+        rerun = sum(greedy[CONFIDENCE_FIELD] < threshold for greedy in greedy_preds)
+        agree = sum(
+            all(a.get(field, '') == b.get(field, '') for field in FIELDS) for a, b in zip(beam_preds, preds)
+        )
+        print(f"adaptive @ {threshold:.2f}:   {rate:8.1f} rows/s  ({rate / beam_rate:.2f}x beam), "
+              f"{rerun / len(prompts):6.1%} re-run, {agree / len(prompts):6.1%} rows match beam search")
+
+if __name__ == "__main__":
+    main()
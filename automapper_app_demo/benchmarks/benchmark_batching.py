@@ -0,0 +1,72 @@
+"""Compare fixed-size batching against token-budget batching on CPU.
+
+Usage (from automapper_app_demo/):
+    python benchmarks/benchmark_batching.py --rows 512
+    python benchmarks/benchmark_batching.py --input plan.csv
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import torch
+from utils.file_processor import PlacementPredictor, CONFIDENCE_FIELD
+
+def synthetic_prompts(predictor, rows, seed=42):
+    """Placement names with a wide spread of lengths, like real media plans"""
+    rng = random.Random(seed)
+    tokens = ['Display', 'Video', 'Native', 'Prospecting', 'Retargeting', '300x250', '728x90',
+              'Desktop', 'Mobile', 'CTV', 'Q1', 'Q2', 'Brand', 'Awareness', 'Conversion', 'Audience']
+    prompts = []
+    for i in range(rows):
+        name = '_'.join(rng.choice(tokens) for _ in range(rng.randint(2, 30)))
+        prompts.append(predictor.prepare_input(f"Campaign {i % 7}", name))
+    return prompts
+
+def file_prompts(predictor, path):
+    df = pd.read_csv(path)
+    return [
+        predictor.prepare_input(row['Campaign'], row['Placement Name'])
+        for _, row in df.iterrows()
+    ]
+
+def run(predictor, prompts, batching):
+    predictor.batching = batching
+    start = time.perf_counter()
+    predictions = predictor.predict(prompts)
+    elapsed = time.perf_counter() - start
+    print(f"{batching:>13}: {elapsed:8.2f}s  {len(prompts) / elapsed:8.1f} rows/s")
+    return predictions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', default=os.getenv('MODEL_DIR', './model_outputs'))
+    parser.add_argument('--input', help="CSV with Campaign and Placement Name columns")
+    parser.add_argument('--rows', type=int, default=512, help="Synthetic prompt count when --input is not given")
+    parser.add_argument('--max-batch-tokens', type=int, default=4096)
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    predictor = PlacementPredictor(args.model_dir, device=torch.device('cpu'))
+    predictor.max_batch_tokens = args.max_batch_tokens
+    prompts = file_prompts(predictor, args.input) if args.input else synthetic_prompts(predictor, args.rows)
+
+    print(f"{len(prompts)} prompts, {torch.get_num_threads()} threads, max_batch_tokens={args.max_batch_tokens}")
+    fixed = run(predictor, prompts, 'fixed')
+    bucketed = run(predictor, prompts, 'token_budget')
+    # Confidence can shift slightly with padding; compare the predicted fields only
+    mismatches = sum(
+        {k: v for k, v in a.items() if k != CONFIDENCE_FIELD} != {k: v for k, v in b.items() if k != CONFIDENCE_FIELD}
+        for a, b in zip(fixed, bucketed)
+    )
+    print(f"Predictions differing between modes: {mismatches}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Time neighbour index builds and batch queries over the master file.
+
+Usage (from automapper_app_demo/):
+    python benchmarks/benchmark_neighbor_index.py --rows 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.master_data import MASTER_DATA_PATH, get_master_data
+from utils.neighbor_index import NeighborIndex, NEIGHBOR_SKIP_SIMILARITY
+
+def variants(entries, rows, seed=42):
+    """(campaign, name) pairs of near-variants of mapped placement names: changed dates and sizes, added suffixes"""
+    rng = random.Random(seed)
+    suffixes = ['_Q3', '_2025', ' - v2', '_300x250', '_NEW', '']
+    pairs = list(zip(entries['Campaign'], entries['Placement Name']))
+    picks = [rng.choice(pairs) for _ in range(rows)]
+    return [campaign for campaign, _ in picks], [f"{name}{rng.choice(suffixes)}" for _, name in picks]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--master-path', default=MASTER_DATA_PATH)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--threshold', type=float, default=NEIGHBOR_SKIP_SIMILARITY)
+    args = parser.parse_args()
+
+    master_df = get_master_data(args.master_path).df
+    start = time.perf_counter()
+    index = NeighborIndex(master_df)
+    print(f"build:  {time.perf_counter() - start:7.2f}s for {len(index.entries)} placements")
+
+    campaigns, queries = variants(index.entries, args.rows)
+    start = time.perf_counter()
+    matches, similarities = index.best_matches(campaigns, queries, args.threshold)
+    elapsed = time.perf_counter() - start
+    answered = sum(match is not None for match in matches)
+    print(f"query:  {elapsed * 1000:7.1f}ms for {len(queries)} names ({elapsed / len(queries) * 1e6:.0f} us/name), "
+          f"{answered / len(queries):.1%} at similarity >= {args.threshold}")
+
+if __name__ == "__main__":
+    main()
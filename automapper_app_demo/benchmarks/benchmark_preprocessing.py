@@ -0,0 +1,96 @@
+"""Time the work process_file does outside the model: row-wise loops vs the vectorized path.
+
+Covers ':D' cleaning, master lookup keys, prompt construction and unpacking
+predictions into columns, and checks both paths produce the same output.
+
+Usage (from automapper_app_demo/):
+    python benchmarks/benchmark_preprocessing.py --rows 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from utils.file_processor import PlacementPredictor, clean_input
+from utils.master_data import MasterData, MAPPING_COLUMNS, normalize_key, normalize_keys
+
+FIELDS = list(MAPPING_COLUMNS)
+
+def synthetic_plan(rows, seed=42):
+    rng = random.Random(seed)
+    tokens = ['Display', 'Video', 'Native', 'Prospecting', 'Retargeting', '300x250', '728x90',
+              'Desktop', 'Mobile', 'CTV', 'Q1', 'Q2', 'Brand', 'Awareness', 'Conversion', 'Audience']
+    names = ['_'.join(rng.choice(tokens) for _ in range(rng.randint(2, 12))) for _ in range(rows // 20 + 1)]
+    return pd.DataFrame({
+        'Campaign': [f"Campaign {rng.randint(0, 50)}" for _ in range(rows)],
+        'Placement Name': [rng.choice(names) + (":D123456" if rng.random() < 0.3 else "") for _ in range(rows)],
+        'DCM Campaign Name': [rng.choice(['', None, 'DCM Brand', 'DCM Performance']) for _ in range(rows)],
+        'Media ID': [rng.randint(10**8, 10**9) for _ in range(rows)]
+    })
+
+def synthetic_master(plan):
+    master = plan.drop_duplicates(['Campaign', 'Placement Name']).iloc[::2]
+    return pd.DataFrame({
+        'CAMPAIGN': master['Campaign'],
+        'PLACEMENT_NAME': master['Placement Name'],
+        **{col: f"{field} value" for field, col in MAPPING_COLUMNS.items()}
+    })
+
+def row_wise(df, master, predictor):
+    df = df.copy()
+    df['Media ID'] = df['Media ID'].astype(str)
+    df['Placement Name'] = df['Placement Name'].apply(
+        lambda x: x.split(":D")[0].strip() if isinstance(x, str) and ":D" in x else x
+    )
+    keys = zip(df['Campaign'].map(normalize_key), df['Placement Name'].map(normalize_key))
+    predictions = [master.mapping_index.get(key) for key in keys]
+    prompts = [
+        predictor.prepare_input(row['Campaign'], row['Placement Name'], row['DCM Campaign Name'])
+        for _, row in df.iterrows()
+    ]
+    predictions = [pred if pred is not None else {field: 'model' for field in FIELDS} for pred in predictions]
+    for field in FIELDS:
+        df[field] = [pred.get(field, '') for pred in predictions]
+    return df, prompts
+
+def vectorized(df, master, predictor):
+    df = clean_input(df.copy())
+    predictions = master.lookup(normalize_keys(df['Campaign']), normalize_keys(df['Placement Name']))
+    prompts = predictor.prepare_inputs(df['Campaign'], df['Placement Name'], df['DCM Campaign Name'])
+    unmapped = np.flatnonzero(pd.isna(predictions))
+    predictions[unmapped] = [{field: 'model' for field in FIELDS}] * len(unmapped)
+    fields = pd.DataFrame.from_records(list(predictions), columns=FIELDS).fillna('')
+    for field in FIELDS:
+        df[field] = fields[field].to_numpy()
+    return df, list(prompts)
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    plan = synthetic_plan(args.rows)
+    master = MasterData(synthetic_master(plan))
+    # Prompt construction needs no model weights
+    predictor = PlacementPredictor.__new__(PlacementPredictor)
+
+    (slow_df, slow_prompts), slow = timed(row_wise, plan, master, predictor)
+    (fast_df, fast_prompts), fast = timed(vectorized, plan, master, predictor)
+
+    assert slow_prompts == fast_prompts, "prompts differ"
+    pd.testing.assert_frame_equal(slow_df[FIELDS + ['Placement Name']], fast_df[FIELDS + ['Placement Name']])
+    print(f"row-wise:   {slow:7.2f}s ({slow / args.rows * 1e6:6.1f} us/row)")
+    print(f"vectorized: {fast:7.2f}s ({fast / args.rows * 1e6:6.1f} us/row), {slow / fast:.1f}x faster")
+
+if __name__ == "__main__":
+    main()
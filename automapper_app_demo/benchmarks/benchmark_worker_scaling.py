@@ -0,0 +1,49 @@
+"""Measure prediction throughput as inference worker processes scale from 1 to N.
+
+Usage (from automapper_app_demo/):
+    python benchmarks/benchmark_worker_scaling.py --rows 512 --max-workers 8
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from utils.file_processor import PlacementPredictor
+from utils.inference_pool import PredictorPool
+from benchmark_batching import synthetic_prompts
+
+def timed(predictor, prompts):
+    start = time.perf_counter()
+    predictor.predict(prompts)
+    return len(prompts) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', default=os.getenv('MODEL_DIR', './model_outputs'))
+    parser.add_argument('--rows', type=int, default=512)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    predictor = PlacementPredictor(args.model_dir, device=torch.device('cpu'), precision='fp32', backend='torch')
+    prompts = synthetic_prompts(predictor, args.rows)
+
+    baseline = timed(predictor, prompts)
+    print(f"in-process, {torch.get_num_threads()} threads: {baseline:8.1f} rows/s")
+
+    workers = 1
+    while workers <= args.max_workers:
+        pool = PredictorPool(predictor, workers)
+        try:
+            pool.predict(prompts[:workers])  # let every worker finish starting up
+            rate = timed(pool, prompts)
+        finally:
+            pool.close()
+        print(f"{workers:>2} workers x {pool.threads_per_worker:>2} threads: {rate:8.1f} rows/s "
+              f"({rate / baseline:.2f}x)")
+        workers *= 2
+
+if __name__ == "__main__":
+    main()
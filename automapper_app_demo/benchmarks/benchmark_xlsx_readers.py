@@ -0,0 +1,65 @@
+"""Time XLSX parsing engines on synthetic media plan workbooks of increasing size.
+
+Usage (from automapper_app_demo/):
+    python benchmarks/benchmark_xlsx_readers.py --rows 1000 10000 50000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from openpyxl import Workbook
+from utils.upload_reader import CalamineWorkbook, PIPELINE_COLUMNS, read_xlsx
+
+EXTRA_COLUMNS = ['Site', 'Start Date', 'End Date', 'Rate', 'Units', 'Cost', 'Notes', 'Creative', 'Size', 'Package']
+
+def write_workbook(path, rows, seed=42):
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(PIPELINE_COLUMNS + EXTRA_COLUMNS)
+    for i in range(rows):
+        sheet.append([
+            f"Campaign {i % 20}",
+            f"Placement_{rng.randint(0, 5000)}_Display_300x250:D{i}",
+            f"DCM Campaign {i % 20}",
+            1000000 + i,
+            f"site{i % 50}.com", '2025-01-01', '2025-03-31',
+            round(rng.uniform(1, 20), 2), rng.randint(1000, 100000), round(rng.uniform(100, 5000), 2),
+            'lorem ipsum dolor sit amet', f"creative_{i % 300}", '300x250', f"Package {i % 10}"
+        ])
+    workbook.save(path)
+
+def timed(label, func):
+    start = time.perf_counter()
+    df = func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<36} {elapsed:8.2f}s  {len(df) / elapsed:10.0f} rows/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    if CalamineWorkbook is None:
+        print("python-calamine is not installed; only openpyxl engines are timed")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f"plan_{rows}.xlsx")
+            write_workbook(path, rows)
+            print(f"{rows} rows ({os.path.getsize(path) / 1e6:.1f} MB):")
+            timed("pd.read_excel (openpyxl, baseline)", lambda: pd.read_excel(path, engine='openpyxl'))
+            timed("openpyxl read-only", lambda: read_xlsx(path, engine='openpyxl'))
+            if CalamineWorkbook is not None:
+                timed("calamine", lambda: read_xlsx(path, engine='calamine'))
+                timed("calamine, pipeline columns only",
+                      lambda: read_xlsx(path, columns=PIPELINE_COLUMNS, engine='calamine'))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Check that every export format reads back to the frame that was exported.
+
+Also checks that reordered frames get their own memo key, so a download never
+serves another frame's cached bytes.
+
+Usage (from automapper_app_demo/):
+    python benchmarks/check_export_roundtrip.py --rows 20000
+
+Exits with status 1 if any format loses or changes data.
+"""
+import argparse
+import gzip
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from utils.export_utils import EXPORT_FORMATS, export_bytes, dataframe_version
+
+def sample_frame(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Campaign': [f"Campaign {i % 50}" for i in range(rows)],
+        'Placement Name': [f"Placement_{i}_300x250" for i in range(rows)],
+        'Media ID': [str(10**8 + i) for i in range(rows)],
+        'Confidence': rng.random(rows).round(4),
+        'Tactic': np.where(rng.random(rows) < 0.1, None, 'Prospecting')
+    })
+
+def read_back(data, fmt):
+    if fmt == 'xlsx':
+        return pd.read_excel(io.BytesIO(data), engine='openpyxl', dtype={'Media ID': str})
+    if fmt == 'csv':
+        return pd.read_csv(io.BytesIO(data), dtype={'Media ID': str})
+    if fmt == 'csv.gz':
+        return pd.read_csv(io.BytesIO(gzip.decompress(data)), dtype={'Media ID': str})
+    return pd.read_parquet(io.BytesIO(data))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    df = sample_frame(args.rows)
+    failures = 0
+    for fmt in EXPORT_FORMATS:
+        start = time.perf_counter()
+        data = export_bytes(df, fmt)
+        elapsed = time.perf_counter() - start
+        result = read_back(data, fmt)
+        try:
+            pd.testing.assert_frame_equal(
+                result.astype(object).where(result.notna(), None),
+                df.astype(object).where(df.notna(), None),
+                check_dtype=False
+            )
+            status = 'ok'
+        except AssertionError as e:
+            failures += 1
+            status = f"MISMATCH: {str(e).splitlines()[0]}"
+        print(f"{fmt:<8} {elapsed:6.2f}s {len(data) / 1024:8.0f} KB  {status}")
+
+    reversed_df = df.iloc[::-1].reset_index(drop=True)
+    if dataframe_version(reversed_df) == dataframe_version(df):
+        failures += 1
+        print("memo key ignores row order")
+    elif export_bytes(reversed_df, 'csv') == export_bytes(df, 'csv'):
+        failures += 1
+        print("reordered frame was served the original frame's cached bytes")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
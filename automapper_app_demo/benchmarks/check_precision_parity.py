@@ -0,0 +1,74 @@
+"""Compare parsed fields from a low-precision model against fp32 on a held-out file.
+
+Usage (from automapper_app_demo/):
+    python benchmarks/check_precision_parity.py holdout.csv --precision int8
+    python benchmarks/check_precision_parity.py holdout.csv --precision bf16 --min-agreement 0.99
+
+Exits with status 1 if any field's agreement falls below --min-agreement.
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import torch
+from utils.file_processor import PlacementPredictor
+
+FIELDS = ['Placement Group', 'Publisher', 'Tactic', 'Audience', 'Ad Type']
+
+def load_prompts(predictor, path):
+    df = pd.read_excel(path, engine='openpyxl') if path.endswith('.xlsx') else pd.read_csv(path)
+    prompts = []
+    for _, row in df.iterrows():
+        dcm_name = row.get('DCM Campaign Name', '')
+        prompts.append(predictor.prepare_input(
+            row['Campaign'],
+            row['Placement Name'],
+            dcm_name if isinstance(dcm_name, str) else ''
+        ))
+    return prompts
+
+def timed_predict(predictor, prompts):
+    start = time.perf_counter()
+    predictions = predictor.predict(prompts)
+    elapsed = time.perf_counter() - start
+    print(f"{predictor.precision:>5}: {elapsed:8.2f}s  {len(prompts) / elapsed:8.1f} rows/s  "
+          f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    return predictions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="Held-out CSV/XLSX with Campaign and Placement Name columns")
+    parser.add_argument('--model-dir', default=os.getenv('MODEL_DIR', './model_outputs'))
+    parser.add_argument('--precision', choices=['int8', 'bf16'], default='int8')
+    parser.add_argument('--min-agreement', type=float, default=0.98)
+    args = parser.parse_args()
+
+    cpu = torch.device('cpu')
+    # Run the candidate first so peak RSS reflects its own footprint
+    candidate = PlacementPredictor(args.model_dir, device=cpu, precision=args.precision)
+    prompts = load_prompts(candidate, args.input)
+    candidate_preds = timed_predict(candidate, prompts)
+    del candidate
+
+    baseline = PlacementPredictor(args.model_dir, device=cpu, precision='fp32')
+    baseline_preds = timed_predict(baseline, prompts)
+
+    failed = False
+    print(f"\nField agreement with fp32 over {len(prompts)} rows:")
+    for field in FIELDS:
+        agree = sum(a.get(field, '') == b.get(field, '') for a, b in zip(baseline_preds, candidate_preds))
+        rate = agree / len(prompts) if prompts else 1.0
+        failed |= rate < args.min_agreement
+        print(f"  {field:<16} {rate:7.2%}")
+    exact = sum(all(a.get(field, '') == b.get(field, '') for field in FIELDS) for a, b in zip(baseline_preds, candidate_preds))
+    print(f"  {'All fields':<16} {exact / len(prompts) if prompts else 1.0:7.2%}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
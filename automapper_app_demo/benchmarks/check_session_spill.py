@@ -0,0 +1,65 @@
+"""Check that session frames spill to disk and read back, including mixed-type object columns.
+
+Usage (from automapper_app_demo/):
+    python benchmarks/check_session_spill.py --rows 20000
+
+Exits with status 1 if a frame fails to spill or reads back with different values.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from utils.session_memory import SessionFrames
+
+def sample_frame(rows):
+    return pd.DataFrame({
+        'Campaign': [f"Campaign {i % 50}" for i in range(rows)],
+        'Placement Name': [f"Placement_{i}_300x250" for i in range(rows)],
+        # Inferred upload columns and editor changes can mix ints, strings and missing values
+        'Extra': [[1, 'two', None][i % 3] for i in range(rows)]
+    })
+
+def as_text(df):
+    """Spilled object columns come back as strings; compare every cell as text, missing as None"""
+    return df.astype(object).map(lambda value: None if pd.isna(value) else str(value))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    df = sample_frame(args.rows)
+    failures = 0
+    with tempfile.TemporaryDirectory() as spill_dir:
+        frames = SessionFrames(budget_mb=0.0001, spill_dir=spill_dir)
+        released = []
+        try:
+            frames.put('processed_df', df, release=lambda: released.append('processed_df'))
+            frames.put('final_df', df.copy())
+        except Exception as e:
+            print(f"spill failed: {type(e).__name__}: {e}")
+            sys.exit(1)
+
+        spilled = frames.spilled_bytes()
+        print(f"spilled  {spilled / 1024:8.0f} KB, released {released}")
+        if not spilled or released != ['processed_df']:
+            failures += 1
+            print("processed_df was not spilled and released")
+
+        result = frames.get('processed_df')
+        try:
+            pd.testing.assert_frame_equal(as_text(result), as_text(df))
+            print("read back ok")
+        except AssertionError as e:
+            failures += 1
+            print(f"MISMATCH: {str(e).splitlines()[0]}")
+        frames.clear()
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
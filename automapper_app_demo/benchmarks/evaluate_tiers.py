@@ -0,0 +1,77 @@
+"""Field accuracy vs. CPU throughput for the full model, the distilled student and the tiered predictor.
+
+The input is a held-out file with Campaign and Placement Name plus the true
+Placement Group, Publisher, Tactic, Audience and Ad Type columns, such as the
+test_split.csv written by automapper_notebooks_t5/distill_t5.py. Escalation
+checks the master file, so run from automapper_app_demo/ with data_db/ in place.
+
+Usage (from automapper_app_demo/):
+    python benchmarks/evaluate_tiers.py model_outputs_student/test_split.csv \\
+        --student-dir ./model_outputs_student --report tier_report.md
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import torch
+from utils.file_processor import PlacementPredictor, TieredPredictor
+
+FIELDS = ['Placement Group', 'Publisher', 'Tactic', 'Audience', 'Ad Type']
+
+def evaluate(name, predictor, prompts, truth):
+    start = time.perf_counter()
+    predictions = predictor.predict(prompts)
+    rate = len(prompts) / (time.perf_counter() - start)
+    predicted = pd.DataFrame.from_records(predictions, columns=FIELDS).fillna('')
+    correct = pd.DataFrame({field: predicted[field].str.strip() == truth[field] for field in FIELDS})
+    row = {'Model': name, 'Rows/s': round(rate, 1)}
+    row.update({field: f"{correct[field].mean():.2%}" for field in FIELDS})
+    row['All fields'] = f"{correct.all(axis=1).mean():.2%}"
+    print(f"{name:<10} {rate:8.1f} rows/s, all fields correct {correct.all(axis=1).mean():.2%}")
+    return row
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="Held-out CSV with Campaign, Placement Name and the true field columns")
+    parser.add_argument('--model-dir', default=os.getenv('MODEL_DIR', './model_outputs'))
+    parser.add_argument('--student-dir', default=os.getenv('STUDENT_MODEL_DIR', './model_outputs_student'))
+    parser.add_argument('--threshold', type=float, default=float(os.getenv('STUDENT_CONFIDENCE_THRESHOLD', '0.9')))
+    parser.add_argument('--report', help="Write the results as a Markdown table to this path")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input)
+    truth = df[FIELDS].fillna('').astype(str).apply(lambda col: col.str.strip())
+
+    cpu = torch.device('cpu')
+    teacher = PlacementPredictor(args.model_dir, device=cpu)
+    student = PlacementPredictor(args.student_dir, device=cpu)
+    student.score_confidence = True  # the tiered predictor escalates on the student's confidence
+    prompts = list(student.prepare_inputs(df['Campaign'], df['Placement Name']))
+    print(f"{len(prompts)} rows, {torch.get_num_threads()} threads")
+
+    tiered = TieredPredictor(student, teacher, confidence_threshold=args.threshold)
+    rows = [
+        evaluate('T5-base', teacher, prompts, truth),
+        evaluate('Student', student, prompts, truth),
+        evaluate('Tiered', tiered, prompts, truth)
+    ]
+    escalated = len(tiered._rows_to_escalate(student.predict(prompts)))
+    print(f"Tiered escalated {escalated / len(prompts):.1%} of rows at threshold {args.threshold}")
+
+    if args.report:
+        columns = list(rows[0])
+        table = [f"| {' | '.join(columns)} |", f"|{'---|' * len(columns)}"]
+        table += [f"| {' | '.join(str(row[col]) for col in columns)} |" for row in rows]
+        with open(args.report, 'w') as f:
+            f.write(f"# Tier evaluation\n\n{len(prompts)} held-out rows from `{args.input}`, CPU, "
+                    f"{torch.get_num_threads()} threads. Student confidence threshold {args.threshold}; "
+                    f"{escalated / len(prompts):.1%} of rows escalated to T5-base.\n\n")
+            f.write("\n".join(table) + "\n")
+        print(f"Report written to {args.report}")
+
+if __name__ == "__main__":
+    main()
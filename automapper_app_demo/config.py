@@ -25,6 +25,13 @@ class Config:
     TABLE_USERS = 'AUTOMAPPER_USERS'
     TABLE_FILE_VERSIONS = 'AUTOMAPPER_FILE_VERSIONS'
     
+    # Database access: 'snowflake', or 'local' for the SQLite stand-in used in development
+    DB_BACKEND = os.getenv('DB_BACKEND', 'local')
+    LOCAL_DB_PATH = os.getenv('LOCAL_DB_PATH', './cache/automapper.sqlite')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '4'))
+    # Directory standing in for the Snowflake stages when DB_BACKEND is 'local'
+    LOCAL_STAGE_DIR = os.getenv('LOCAL_STAGE_DIR', './cache/stages')
+
     # App configuration
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
 
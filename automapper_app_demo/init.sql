@@ -7,12 +7,12 @@ CREATE STAGE IF NOT EXISTS AUTOMAPPER_UPLOAD_STAGE
     COMMENT = 'Stage for initial file uploads';
 
 CREATE STAGE IF NOT EXISTS AUTOMAPPER_PROCESSED_STAGE
-    FILE_FORMAT = (TYPE = CSV FIELD_OPTIONALLY_ENCLOSED_BY = '"')
-    COMMENT = 'Stage for processed files';
+    FILE_FORMAT = (TYPE = PARQUET COMPRESSION = ZSTD)
+    COMMENT = 'Stage for processed files (zstd Parquet)';
 
 CREATE STAGE IF NOT EXISTS AUTOMAPPER_ARCHIVE_STAGE
-    FILE_FORMAT = (TYPE = CSV FIELD_OPTIONALLY_ENCLOSED_BY = '"')
-    COMMENT = 'Stage for archived files';
+    FILE_FORMAT = (TYPE = PARQUET COMPRESSION = ZSTD)
+    COMMENT = 'Stage for archived files (zstd Parquet)';
 
 -- Create users table if it doesn't exist
 CREATE TABLE IF NOT EXISTS AUTOMAPPER_USERS (
@@ -162,4 +162,10 @@ GRANT SELECT, INSERT, UPDATE ON TABLE SCHEMA.DB..AUTOMAPPER_FILE_VERSIONS TO ROL
 ALTER TABLE AUTOMAPPER_FILE_SUBMISSIONS 
 ADD COLUMN IF NOT EXISTS ARCHIVED BOOLEAN DEFAULT FALSE,
 ADD COLUMN IF NOT EXISTS ARCHIVED_AT TIMESTAMP_NTZ DEFAULT NULL,
-ADD COLUMN IF NOT EXISTS ARCHIVE_PATH VARCHAR(255) DEFAULT NULL;
\ No newline at end of file
+ADD COLUMN IF NOT EXISTS ARCHIVE_PATH VARCHAR(255) DEFAULT NULL;
+
+-- Add prediction job tracking columns to file submissions table
+ALTER TABLE AUTOMAPPER_FILE_SUBMISSIONS
+ADD COLUMN IF NOT EXISTS JOB_STATUS VARCHAR(50) DEFAULT NULL,
+ADD COLUMN IF NOT EXISTS JOB_PROGRESS FLOAT DEFAULT NULL,
+ADD COLUMN IF NOT EXISTS JOB_ERROR VARCHAR(16777216) DEFAULT NULL;
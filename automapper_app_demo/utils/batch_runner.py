@@ -0,0 +1,243 @@
+"""Headless batch runner over process_file, for backfills without the Streamlit UI.
+
+Usage (from automapper_app_demo/):
+    python -m utils.batch_runner plans/*.csv "archive/**/*.xlsx" --output-dir mapped --format parquet
+    python -m utils.batch_runner --watch incoming --output-dir mapped
+
+Each input is written to <output-dir>/<name>.mapped.<ext>. The model is loaded
+once and shared by every file. Processed chunks are checkpointed under
+<output-dir>/.partial/, so an interrupted run resumes at the first unfinished
+chunk. Finished inputs are recorded in <output-dir>/batch_manifest.json and
+skipped on later runs until they change.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+import pandas as pd
+from utils.upload_reader import UPLOAD_COLUMNS, CHUNK_SIZE, iter_file_chunks
+from utils.file_processor import process_file, clean_input, warm_up_predictor, prediction_cache_stats
+from utils.export_utils import EXPORT_FORMATS, write_parquet, write_export
+
+logger = logging.getLogger(__name__)
+
+INPUT_EXTENSIONS = ('.csv', '.xlsx')
+MANIFEST_NAME = 'batch_manifest.json'
+PARTIAL_DIR = '.partial'
+SOURCES = ['lookup', 'neighbour', 'model']
+
+def _signature(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def _is_input(path):
+    name = os.path.basename(path)
+    # Skip Excel lock files and hidden/temporary files
+    return name.lower().endswith(INPUT_EXTENSIONS) and not name.startswith(('~$', '.'))
+
+def expand_inputs(patterns):
+    """Resolve files, globs and directories (their top-level CSV/XLSX files) to sorted absolute paths"""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        elif glob.has_magic(pattern):
+            matches = glob.glob(pattern, recursive=True)
+        else:
+            matches = [pattern]
+        paths.extend(os.path.abspath(path) for path in matches if _is_input(path))
+    return sorted(set(paths))
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+class BatchRunner:
+    """Maps input files into output_dir one chunk at a time, resumable through a manifest and chunk checkpoints"""
+
+    def __init__(self, output_dir, fmt='csv', chunk_size=CHUNK_SIZE, force=False):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported output format: {fmt}")
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.chunk_size = chunk_size
+        self.force = force
+        self.manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        os.makedirs(os.path.join(output_dir, PARTIAL_DIR), exist_ok=True)
+        self.manifest = self._load_manifest()
+        self.totals = {'files': 0, 'rows': 0, 'seconds': 0.0, 'hits': 0, 'misses': 0, **dict.fromkeys(SOURCES, 0)}
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        _write_atomic(self.manifest_path, json.dumps(self.manifest, indent=2).encode('utf-8'))
+
+    def output_path(self, input_path):
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        return os.path.join(self.output_dir, f"{stem}.mapped{EXPORT_FORMATS[self.fmt][0]}")
+
+    def is_done(self, input_path):
+        entry = self.manifest.get(input_path)
+        if self.force or entry is None:
+            return False
+        try:
+            signature = _signature(input_path)
+        except FileNotFoundError:
+            return False
+        return signature == entry['signature'] and entry['format'] == self.fmt and os.path.exists(entry['output'])
+
+    def _partial_dir(self, input_path, signature):
+        """Checkpoint directory, specific to this version of the input and the chunk size"""
+        key = hashlib.sha1(json.dumps([input_path, signature, self.chunk_size]).encode('utf-8')).hexdigest()[:12]
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        return os.path.join(self.output_dir, PARTIAL_DIR, f"{stem}-{key}")
+
+    def run_file(self, input_path):
+        """Process one input, resuming from its checkpointed chunks; returns the file's stats"""
+        signature = _signature(input_path)
+        partial_dir = self._partial_dir(input_path, signature)
+        os.makedirs(partial_dir, exist_ok=True)
+        done_parts = sorted(name for name in os.listdir(partial_dir) if name.endswith('.parquet'))
+        if done_parts:
+            print(f"Resuming {input_path} after {len(done_parts)} checkpointed chunks")
+
+        stats = {'rows': 0, **dict.fromkeys(SOURCES, 0)}
+        cache_before = prediction_cache_stats()
+        start = time.perf_counter()
+        chunks = iter_file_chunks(input_path, input_path.lower(), self.chunk_size, columns=UPLOAD_COLUMNS)
+        for i, chunk in enumerate(chunks):
+            if i < len(done_parts):
+                continue
+            processed_chunk = process_file(clean_input(chunk))
+            part_path = os.path.join(partial_dir, f"part-{i:05d}.parquet")
+            write_parquet(processed_chunk, f"{part_path}.tmp")
+            os.replace(f"{part_path}.tmp", part_path)
+            stats['rows'] += len(processed_chunk)
+            for source, count in processed_chunk['Mapping Source'].value_counts().items():
+                stats[source] = stats.get(source, 0) + int(count)
+
+        parts = sorted(name for name in os.listdir(partial_dir) if name.endswith('.parquet'))
+        frames = [pd.read_parquet(os.path.join(partial_dir, name)) for name in parts]
+        result = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        output_path = self.output_path(input_path)
+        write_export(result, self.fmt, f"{output_path}.tmp")
+        os.replace(f"{output_path}.tmp", output_path)
+
+        stats['seconds'] = time.perf_counter() - start
+        cache_after = prediction_cache_stats()
+        stats['hits'] = cache_after['hits'] - cache_before['hits']
+        stats['misses'] = cache_after['misses'] - cache_before['misses']
+        self.manifest[input_path] = {
+            'signature': signature, 'format': self.fmt, 'output': output_path, 'rows': len(result)
+        }
+        self._save_manifest()
+        for name in parts:
+            os.remove(os.path.join(partial_dir, name))
+        os.rmdir(partial_dir)
+
+        self.totals['files'] += 1
+        for key, value in stats.items():
+            self.totals[key] += value
+        print(f"{os.path.basename(input_path)}: {_format_stats(stats)} -> {output_path}")
+        return stats
+
+    def run(self, input_paths):
+        """Process every input that isn't done yet; returns the inputs that failed"""
+        outputs = {entry['output']: path for path, entry in self.manifest.items()}
+        failed = []
+        for path in input_paths:
+            if self.is_done(path):
+                logger.info(f"Skipping {path}, already mapped")
+                continue
+            first = outputs.setdefault(self.output_path(path), path)
+            if first != path:
+                print(f"{os.path.basename(path)}: SKIPPED (would overwrite the output of {first})")
+                failed.append(path)
+                continue
+            try:
+                self.run_file(path)
+            except Exception as e:
+                logger.error(f"Failed to map {path}: {str(e)}", exc_info=True)
+                print(f"{os.path.basename(path)}: FAILED ({str(e)})")
+                failed.append(path)
+        return failed
+
+    def watch(self, directory, poll_seconds=10):
+        """Map files as they appear in directory until interrupted; files must stop changing for one poll first"""
+        print(f"Watching {directory} every {poll_seconds}s (Ctrl+C to stop)")
+        last_seen = {}
+        failed = {}
+        while True:
+            ready = []
+            current = {}
+            for path in expand_inputs([directory]):
+                if self.is_done(path):
+                    continue
+                try:
+                    current[path] = _signature(path)
+                except FileNotFoundError:
+                    continue  # Moved or deleted since the directory was listed
+                # Don't retry a failed file until it changes
+                if last_seen.get(path) == current[path] and failed.get(path) != current[path]:
+                    ready.append(path)
+            last_seen = current
+            for path in self.run(ready):
+                failed[path] = current[path]
+            time.sleep(poll_seconds)
+
+def _format_stats(stats):
+    seconds = max(stats['seconds'], 1e-9)
+    prompts = stats['hits'] + stats['misses']
+    hit_rate = stats['hits'] / prompts if prompts else 0.0
+    return (f"{stats['rows']:,} rows in {stats['seconds']:.1f}s ({stats['rows'] / seconds:,.1f} rows/s); "
+            f"lookup {stats['lookup']:,}, neighbour {stats['neighbour']:,}, model {stats['model']:,}; "
+            f"cache hits {stats['hits']:,} of {prompts:,} prompts ({hit_rate:.0%})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='*', help="CSV/XLSX files, globs or directories")
+    parser.add_argument('--output-dir', required=True)
+    parser.add_argument('--format', default='csv', choices=list(EXPORT_FORMATS))
+    parser.add_argument('--watch', metavar='DIR', help="Keep mapping new files dropped into DIR")
+    parser.add_argument('--poll-seconds', type=float, default=10)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--force', action='store_true', help="Re-map inputs already recorded as done")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    if not args.inputs and not args.watch:
+        parser.error("give input files or --watch DIR")
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    runner = BatchRunner(args.output_dir, fmt=args.format, chunk_size=args.chunk_size, force=args.force)
+    input_paths = expand_inputs(args.inputs)
+    pending = [path for path in input_paths if not runner.is_done(path)]
+    print(f"{len(input_paths)} inputs, {len(input_paths) - len(pending)} already mapped")
+
+    failed = []
+    try:
+        if pending or args.watch:
+            warm_up_predictor()
+        failed = runner.run(pending)
+        if args.watch:
+            runner.watch(args.watch, args.poll_seconds)
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume from the last checkpointed chunk")
+        sys.exit(130)
+    finally:
+        if runner.totals['files']:
+            print(f"Total: {runner.totals['files']} files, {_format_stats(runner.totals)}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Output fields in generation order, with the get_reference_data() key holding each field's vocabulary
+OUTPUT_FIELDS = [
+    ('Placement Group', 'PLACEMENT_GROUP'),
+    ('Publisher', 'PUBLISHER'),
+    ('Tactic', 'TACTIC'),
+    ('Audience', 'AUDIENCE'),
+    ('Ad Type', 'AD_TYPE'),
+]
+
+def vocabularies_from_reference(reference_data):
+    """Map get_reference_data() output to {output field: [allowed values]}"""
+    return {field: list(reference_data.get(key, [])) for field, key in OUTPUT_FIELDS}
+
+class _TrieNode:
+    __slots__ = ('children', 'terminal')
+
+    def __init__(self):
+        self.children = {}
+        self.terminal = False
+
+class FieldGrammar:
+    """Constrains generation to "Key: value; Key: value; ..." over fixed vocabularies.
+
+    Each field is a trie over the token ids of "<Key>: <value>;" for every allowed
+    value (the last field ends in EOS instead of ";"). Pass the instance as
+    prefix_allowed_tokens_fn to model.generate().
+    """
+
+    def __init__(self, tokenizer, vocabularies):
+        missing = [field for field, _ in OUTPUT_FIELDS if not vocabularies.get(field)]
+        if missing:
+            raise ValueError(f"No vocabulary for constrained field(s): {missing}")
+
+        self.eos_token_id = tokenizer.eos_token_id
+        self.pad_token_id = tokenizer.pad_token_id
+        self.tries = []
+        self.max_length = 1  # decoder start token
+        fingerprint = hashlib.sha256()
+
+        for i, (field, _) in enumerate(OUTPUT_FIELDS):
+            is_last = i == len(OUTPUT_FIELDS) - 1
+            root = _TrieNode()
+            longest = 0
+            for value in sorted(set(vocabularies[field])):
+                text = f"{field}: {value}" if is_last else f"{field}: {value};"
+                ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+                if is_last:
+                    ids = ids + [self.eos_token_id]
+                node = root
+                for token_id in ids:
+                    node = node.children.setdefault(token_id, _TrieNode())
+                node.terminal = True
+                longest = max(longest, len(ids))
+                fingerprint.update(text.encode())
+            self.tries.append(root)
+            self.max_length += longest
+
+        self.fingerprint = fingerprint.hexdigest()[:12]
+
+    def _allowed(self, field_index, node):
+        allowed = list(node.children)
+        if node.terminal and field_index + 1 < len(self.tries):
+            allowed.extend(self.tries[field_index + 1].children)
+        return allowed
+
+    def __call__(self, batch_id, input_ids):
+        field_index = 0
+        node = self.tries[0]
+        # Skip the decoder start token
+        for token_id in input_ids.tolist()[1:]:
+            if token_id in node.children:
+                node = node.children[token_id]
+            elif node.terminal and field_index + 1 < len(self.tries) \
+                    and token_id in self.tries[field_index + 1].children:
+                field_index += 1
+                node = self.tries[field_index].children[token_id]
+            else:
+                # Finished (EOS already emitted) or off-grammar: only padding may follow
+                return [self.pad_token_id]
+        allowed = self._allowed(field_index, node)
+        return allowed or [self.eos_token_id]
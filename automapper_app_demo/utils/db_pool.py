@@ -0,0 +1,235 @@
+import os
+import queue
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# SQLite stand-in for the tables in init.sql used by snowflake_utils
+LOCAL_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {Config.TABLE_USERS} (
+    ID TEXT PRIMARY KEY,
+    USERNAME TEXT UNIQUE,
+    PASSWORD_HASH TEXT,
+    NAME TEXT,
+    EMAIL TEXT,
+    ACCOUNT_TYPE TEXT,
+    CREATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS {Config.TABLE_FILE_SUBMISSIONS} (
+    ID TEXT PRIMARY KEY,
+    FILENAME TEXT,
+    STATUS TEXT,
+    SUBMITTED_BY TEXT,
+    CREATED_AT TIMESTAMP,
+    UPDATED_AT TIMESTAMP,
+    CAMPAIGN_NAME TEXT,
+    CURRENT_REVIEWER TEXT,
+    STAGE_PATH TEXT,
+    ARCHIVED BOOLEAN DEFAULT FALSE,
+    ARCHIVE_PATH TEXT,
+    ARCHIVED_AT TIMESTAMP,
+    JOB_STATUS TEXT,
+    JOB_PROGRESS REAL,
+    JOB_ERROR TEXT
+);
+CREATE TABLE IF NOT EXISTS {Config.TABLE_SUBMISSION_COMMENTS} (
+    ID TEXT PRIMARY KEY,
+    SUBMISSION_ID TEXT,
+    COMMENT_TEXT TEXT,
+    CREATED_BY TEXT,
+    CREATED_AT TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS {Config.TABLE_STATUS_HISTORY} (
+    ID TEXT PRIMARY KEY,
+    SUBMISSION_ID TEXT,
+    STATUS TEXT,
+    CHANGED_BY TEXT,
+    CHANGED_AT TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS {Config.TABLE_FILE_VERSIONS} (
+    ID TEXT PRIMARY KEY,
+    SUBMISSION_ID TEXT,
+    VERSION_NUMBER INTEGER,
+    STAGE_PATH TEXT,
+    CREATED_BY TEXT,
+    CREATED_AT TIMESTAMP
+);
+"""
+
+class LocalCursor:
+    """sqlite3 cursor accepting the Snowflake connector's %s placeholders"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(sql.replace('%s', '?'), tuple(params))
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+class LocalConnection:
+    """SQLite stand-in with the parts of the Snowflake connection interface the app uses"""
+
+    multi_statement = False
+
+    def __init__(self, path):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Pooled connections move between threads, but only one thread uses a connection at a time
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.executescript(LOCAL_SCHEMA)
+
+    def cursor(self):
+        return LocalCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+def connect():
+    """Open a new connection to Snowflake, or to the local SQLite stand-in (DB_BACKEND=local)"""
+    if Config.DB_BACKEND != 'snowflake':
+        return LocalConnection(Config.LOCAL_DB_PATH)
+    import snowflake.connector
+    conn = snowflake.connector.connect(
+        user=Config.SNOWFLAKE_USER,
+        password=Config.SNOWFLAKE_PASSWORD,
+        account=Config.get_full_account(),
+        warehouse=Config.SNOWFLAKE_WAREHOUSE,
+        database=Config.SNOWFLAKE_DATABASE,
+        schema=Config.SNOWFLAKE_SCHEMA,
+        client_session_keep_alive=True  # pooled sessions stay valid between uses
+    )
+    conn.multi_statement = True
+    return conn
+
+def qualified(table):
+    """Fully qualified table name on Snowflake; the local stand-in has a single schema"""
+    if Config.DB_BACKEND != 'snowflake':
+        return table
+    return f"{Config.SNOWFLAKE_DATABASE}.{Config.SNOWFLAKE_SCHEMA}.{table}"
+
+class ConnectionPool:
+    """
+    Keeps up to max_size open connections and hands each to one caller at a time,
+    so helpers reuse sessions instead of connecting and closing on every call.
+    A connection whose rollback fails after an error is discarded.
+    """
+
+    def __init__(self, connect=connect, max_size=4):
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self.max_size = max_size
+
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+                logger.info("Opened a new database connection")
+            try:
+                yield conn
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception as e:
+                    logger.warning(f"Discarding database connection after failed rollback: {str(e)}")
+                    self._close(conn)
+                    conn = None
+                raise
+            finally:
+                if conn is not None:
+                    self._idle.put(conn)
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+class UnitOfWork:
+    """
+    Writes of one business operation (status update, history row, version row, ...),
+    queued with execute() and sent together by commit(). Snowflake receives them as
+    a single multi-statement request wrapped in a transaction; the local stand-in
+    runs them in one transaction. Reads through fetchone() run immediately.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = []
+
+    def fetchone(self, sql, params=()):
+        cur = self.conn.cursor()
+        cur.execute(sql, params)
+        return cur.fetchone()
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql.strip().rstrip(';'), tuple(params)))
+
+    def commit(self):
+        if not self.statements:
+            return
+        cur = self.conn.cursor()
+        if getattr(self.conn, 'multi_statement', False):
+            sql = ';\n'.join(['BEGIN'] + [sql for sql, _ in self.statements] + ['COMMIT'])
+            params = [param for _, statement_params in self.statements for param in statement_params]
+            cur.execute(sql, params, num_statements=len(self.statements) + 2)
+        else:
+            for sql, params in self.statements:
+                cur.execute(sql, params)
+            self.conn.commit()
+        logger.debug(f"Committed {len(self.statements)} statements in one round-trip")
+        self.statements = []
+
+def get_pool():
+    """Return the process-wide connection pool shared by every session"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(max_size=Config.DB_POOL_SIZE)
+        return _pool
+
+@contextmanager
+def pooled_connection():
+    with get_pool().connection() as conn:
+        yield conn
+
+@contextmanager
+def unit_of_work():
+    """Queue writes on a pooled connection; they are committed together when the block exits cleanly"""
+    with pooled_connection() as conn:
+        work = UnitOfWork(conn)
+        yield work
+        work.commit()
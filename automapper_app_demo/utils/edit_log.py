@@ -0,0 +1,149 @@
+import pandas as pd
+import numpy as np
+import logging
+from utils.search_index import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+def _same_value(a, b):
+    """Equality that treats two missing values as equal and never raises on pd.NA"""
+    if pd.isna(a) and pd.isna(b):
+        return True
+    try:
+        return bool(a == b)
+    except TypeError:
+        return False
+
+class EditLog:
+    """
+    An immutable base DataFrame plus a compact log of edits made in the data editor.
+
+    Edits are stored per cell as {row position: {column: value}}, along with added
+    rows and deleted row positions. Filtered/sorted views are arrays of row positions
+    rather than copies, and only the rows of the visible page are ever materialized
+    until the full edited frame is requested.
+    """
+
+    def __init__(self, base_df, search_index=None):
+        self.base = base_df.reset_index(drop=True)
+        # Built once per processed file and shared read-only; this log's edits go to an overlay
+        self.search_index = (search_index if search_index is not None else SearchIndex(self.base)).overlay()
+        self.rows = self.base  # base plus added rows; only rebuilt when rows are added
+        self.cell_edits = {}
+        self.added_rows = []
+        self.deleted = set()
+        self.version = 0
+        self._views = {}
+        self._materialized = None
+
+    def __len__(self):
+        return len(self.rows) - len(self.deleted)
+
+    def column(self, col):
+        """A column of the current data; copied only if it has edits"""
+        edits = {row: values[col] for row, values in self.cell_edits.items() if col in values}
+        if not edits:
+            return self.rows[col]
+        series = self.rows[col].astype(object)
+        series.iloc[list(edits)] = list(edits.values())
+        return series
+
+    def search(self, term, columns=None):
+        """Row positions containing term (case-insensitive) in any of columns"""
+        return self.search_index.search(term, columns or ['Placement Name', 'Campaign'])
+
+    def view(self, sort_by=None, search_term='', search_columns=None):
+        """Row positions (deleted rows excluded) matching search_term, ordered by sort_by; cached per version"""
+        key = (self.version, sort_by, search_term, tuple(search_columns or ()))
+        if key not in self._views:
+            if search_term:
+                positions = self.search(search_term, search_columns)
+            else:
+                positions = np.arange(len(self.rows))
+            if self.deleted:
+                positions = positions[~np.isin(positions, list(self.deleted))]
+            if sort_by is not None and sort_by in self.rows.columns:
+                values = self.column(sort_by).iloc[positions]
+                try:
+                    values = values.sort_values(kind='stable')
+                except TypeError:
+                    # Edited cells can mix types within a column
+                    values = values.astype(str).sort_values(kind='stable')
+                positions = values.index.to_numpy()
+            self._views = {key: positions}
+        return self._views[key]
+
+    def page(self, positions):
+        """The given rows as a small DataFrame with edits applied, indexed 0..n-1"""
+        page_df = self.rows.iloc[positions].reset_index(drop=True)
+        for col in page_df.columns:
+            if isinstance(page_df[col].dtype, pd.CategoricalDtype):
+                # Categorical columns would only allow existing values in the editor
+                page_df[col] = page_df[col].astype(object)
+        for i, row in enumerate(positions):
+            for col, value in self.cell_edits.get(row, {}).items():
+                if page_df[col].dtype != object:
+                    page_df[col] = page_df[col].astype(object)
+                page_df.at[i, col] = value
+        return page_df
+
+    def apply_editor_changes(self, positions, changes):
+        """
+        Record the delta st.data_editor reports for a page showing the given rows:
+        {"edited_rows": {page row: {col: value}}, "added_rows": [...], "deleted_rows": [...]}.
+        Returns the number of changed cells/rows.
+        """
+        changed = 0
+        for page_row, values in changes.get('edited_rows', {}).items():
+            row = int(positions[int(page_row)])
+            row_edits = self.cell_edits.setdefault(row, {})
+            for col, value in values.items():
+                self.search_index.update(row, col, row_edits.get(col, self.rows.at[row, col]), value)
+                if _same_value(value, self.rows.at[row, col]):
+                    row_edits.pop(col, None)  # edited back to the original value
+                else:
+                    row_edits[col] = value
+                changed += 1
+            if not row_edits:
+                del self.cell_edits[row]
+
+        for page_row in changes.get('deleted_rows', []):
+            self.deleted.add(int(positions[int(page_row)]))
+            changed += 1
+
+        added = [values for values in changes.get('added_rows', []) if values]
+        if added:
+            for i, values in enumerate(added):
+                self.search_index.add_row(len(self.rows) + i, values)
+            self.added_rows.extend(added)
+            self.rows = pd.concat(
+                [self.base, pd.DataFrame(self.added_rows, columns=self.base.columns)],
+                ignore_index=True
+            )
+            changed += len(added)
+
+        if changed:
+            self.version += 1
+            self._views = {}
+            self._materialized = None
+            logger.info(f"Applied {changed} edits ({len(self.cell_edits)} rows edited, "
+                        f"{len(self.added_rows)} added, {len(self.deleted)} deleted)")
+        return changed
+
+    def release_materialized(self):
+        """Drop the cached edited frame (e.g. once it has been spilled to disk); materialize() rebuilds it"""
+        self._materialized = None
+
+    def materialize(self):
+        """The full edited DataFrame; built once per version and the base itself when nothing changed"""
+        if self._materialized is None:
+            if not self.cell_edits and not self.deleted and self.rows is self.base:
+                self._materialized = self.base
+            else:
+                df = self.rows.copy()
+                for col in {col for values in self.cell_edits.values() for col in values}:
+                    df[col] = self.column(col)
+                if self.deleted:
+                    df = df.drop(index=list(self.deleted)).reset_index(drop=True)
+                self._materialized = df
+        return self._materialized
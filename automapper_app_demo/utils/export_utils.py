@@ -0,0 +1,109 @@
+import pandas as pd
+import io
+import gzip
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+logger = logging.getLogger(__name__)
+
+# format -> (file extension, mime type)
+EXPORT_FORMATS = {
+    'xlsx': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('.csv', 'text/csv'),
+    'csv.gz': ('.csv.gz', 'application/gzip'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet')
+}
+
+# Memoized export bytes, keyed by (DataFrame version, format); small because entries can be large
+_EXPORT_CACHE_SIZE = 8
+_export_cache = OrderedDict()
+_export_lock = threading.Lock()
+
+def _xlsx_bytes(df):
+    """Write a workbook row by row in constant-memory mode instead of building it in memory"""
+    output = io.BytesIO()
+    if xlsxwriter is not None:
+        # Constant-memory mode only keeps the current row, so rows must be written strictly in order
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd hh:mm:ss'})
+        sheet = workbook.add_worksheet()
+        sheet.write_row(0, 0, [str(col) for col in df.columns])
+        for i, row in enumerate(df.itertuples(index=False, name=None), start=1):
+            sheet.write_row(i, 0, [None if pd.isna(value) else value for value in row])
+        workbook.close()
+        return output.getvalue()
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([str(col) for col in df.columns])
+    for row in df.itertuples(index=False, name=None):
+        sheet.append([None if pd.isna(value) else value for value in row])
+    workbook.save(output)
+    return output.getvalue()
+
+def write_parquet(df, destination):
+    """Write df as zstd Parquet straight from an Arrow table to a path or binary file object"""
+    # Object columns can hold mixed types that Arrow rejects; store them as strings
+    object_columns = df.select_dtypes(include='object').columns
+    table = pa.Table.from_pandas(df.astype({col: 'string' for col in object_columns}), preserve_index=False)
+    pq.write_table(table, destination, compression='zstd')
+
+def _parquet_bytes(df):
+    output = io.BytesIO()
+    write_parquet(df, output)
+    return output.getvalue()
+
+def _render(df, fmt):
+    if fmt == 'xlsx':
+        return _xlsx_bytes(df)
+    if fmt == 'csv':
+        return df.to_csv(index=False).encode('utf-8')
+    if fmt == 'csv.gz':
+        return gzip.compress(df.to_csv(index=False).encode('utf-8'), compresslevel=5)
+    if fmt == 'parquet':
+        return _parquet_bytes(df)
+    raise ValueError(f"Unsupported export format: {fmt}")
+
+def write_export(df, fmt, destination):
+    """Write df as fmt to a file path without memoizing, for exports written once (e.g. batch outputs)"""
+    if fmt == 'parquet':
+        write_parquet(df, destination)
+        return
+    data = _render(df, fmt)
+    with open(destination, 'wb') as f:
+        f.write(data)
+
+def dataframe_version(df):
+    """Content hash used as the memo key when the caller doesn't track versions"""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return (tuple(df.columns), hashlib.sha1(row_hashes.tobytes()).hexdigest())
+
+def export_bytes(df, fmt='xlsx', version=None):
+    """
+    Serialize df to fmt, memoized per (version, fmt). Pass a version that is unique
+    to this frame's content across sessions (e.g. (session id, edit counter)) to skip
+    hashing the frame.
+    """
+    key = (version if version is not None else dataframe_version(df), fmt)
+    with _export_lock:
+        if key in _export_cache:
+            _export_cache.move_to_end(key)
+            return _export_cache[key]
+
+    data = _render(df, fmt)
+    logger.info(f"Exported {len(df)} rows as {fmt} ({len(data) / 1024:.0f} KB)")
+
+    with _export_lock:
+        _export_cache[key] = data
+        while len(_export_cache) > _EXPORT_CACHE_SIZE:
+            _export_cache.popitem(last=False)
+    return data
@@ -1,25 +1,122 @@
 import pandas as pd
+import numpy as np
 import torch
 from transformers import T5Tokenizer, T5ForConditionalGeneration
 import os
 from datetime import datetime
 import logging
+import threading
+import hashlib
+from utils.prediction_cache import PredictionCache
+from utils.onnx_backend import default_onnx_dir, load_onnx_model
+from utils.constrained_decoding import FieldGrammar, vocabularies_from_reference
+from utils.master_data import get_master_data, normalize_keys, validation_status
+from utils.inference_pool import PredictorPool, available_cpus
+from utils.neighbor_index import NEIGHBOR_SKIP_SIMILARITY, get_neighbor_index
 
 logger = logging.getLogger(__name__)
 
+# Key added to every prediction dict (and column added by process_file) with the model's confidence
+CONFIDENCE_FIELD = 'Confidence'
+
+# Process-wide registry of loaded predictors, keyed by absolute (model, student model) directories.
+# Shared by every Streamlit session/rerun in this process.
+_predictor_registry = {}
+_registry_lock = threading.Lock()
+_prediction_cache = None
+# Prompts answered by cached_predict since the process started, for throughput reporting
+_cache_stats = {'hits': 0, 'misses': 0}
+_cache_stats_lock = threading.Lock()
+
+def _bf16_supported(device):
+    """True if the device has native bfloat16 matmuls (AVX512-BF16/AMX on CPU)"""
+    if device.type == 'cuda':
+        return torch.cuda.is_bf16_supported()
+    check = getattr(torch.cpu, '_is_avx512_bf16_supported', None)
+    return bool(check and check())
+
 class PlacementPredictor:
-    def __init__(self, model_path, device=None):
+    def __init__(self, model_path, device=None, precision=None, backend=None):
         self.device = device if device else torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model_path = model_path
+        # 'torch' (default) or 'onnx' (exported graphs from utils/onnx_backend.py, falls back to torch)
+        self.backend = backend or os.getenv('MODEL_BACKEND', 'torch')
+        # 'fp32' (default), 'int8' (dynamic quantization of Linear layers, CPU only) or 'bf16'
+        self.precision = precision or os.getenv('MODEL_PRECISION', 'fp32')
         self.max_source_length = 200
         self.max_target_length = 128
+        # 'token_budget' sorts prompts by length and packs batches under max_batch_tokens;
+        # 'fixed' keeps the original fixed-size batches in input order
+        self.batching = os.getenv('PREDICT_BATCHING', 'token_budget')
+        self.max_batch_tokens = int(os.getenv('PREDICT_MAX_BATCH_TOKENS', '4096'))
+        # Restrict output to "Key: value; ..." over reference vocabularies (see set_field_vocabularies)
+        self.constrained = os.getenv('CONSTRAINED_DECODING', '0') == '1'
+        self.grammar = None
+        # 'beam' decodes every row with 2 beams; 'adaptive' decodes greedily and re-runs
+        # only rows whose confidence is below confidence_threshold with beams
+        self.decoding = os.getenv('DECODING_MODE', 'beam')
+        self.confidence_threshold = float(os.getenv('CONFIDENCE_THRESHOLD', '0.8'))
+        # Per-row confidence needs the raw logits of every step, so beam decoding only computes it
+        # when asked to (the tiered student, or PREDICT_CONFIDENCE=1 to show it in the editor)
+        self.score_confidence = os.getenv('PREDICT_CONFIDENCE', '0') == '1'
         
         logger.info(f"Using device: {self.device}")
         logger.info(f"Loading model from: {self.model_path}")
         
+        source_version = _model_version(self.model_path)
         self.tokenizer = T5Tokenizer.from_pretrained(self.model_path)
-        self.model = T5ForConditionalGeneration.from_pretrained(self.model_path).to(self.device)
-        self.model.eval()
+        self.model = self._load_onnx(source_version) if self.backend == 'onnx' else None
+        if self.model is None:
+            self.backend = 'torch'
+            self.model = T5ForConditionalGeneration.from_pretrained(self.model_path).to(self.device)
+            self.model.eval()
+            self._apply_precision()
+        # Backend, precision and decoding are part of the version so their cached outputs never mix;
+        # beam results cached without a confidence must not answer a predictor that reports one
+        if self.decoding == 'adaptive':
+            decoding = f"adaptive{self.confidence_threshold}"
+        else:
+            decoding = 'beam-scored' if self.score_confidence else 'beam'
+        self._base_version = f"{source_version}-{self.backend}-{self.precision}-{decoding}"
+        self.model_version = self._base_version
+
+    def _load_onnx(self, source_version):
+        onnx_dir = default_onnx_dir(self.model_path)
+        try:
+            model = load_onnx_model(onnx_dir, source_version)
+        except Exception as e:
+            logger.warning(f"ONNX backend unavailable ({str(e)}), falling back to torch")
+            return None
+        logger.info(f"Using ONNX Runtime backend from: {onnx_dir}")
+        # Exported graphs run on the ONNX Runtime CPU provider at their exported precision
+        self.device = torch.device('cpu')
+        self.precision = 'fp32'
+        return model
+
+    def _apply_precision(self):
+        if self.precision == 'int8':
+            if self.device.type != 'cpu':
+                logger.warning("int8 dynamic quantization is CPU only, falling back to fp32")
+                self.precision = 'fp32'
+                return
+            self.model = torch.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        elif self.precision == 'bf16':
+            if not _bf16_supported(self.device):
+                logger.warning(f"bfloat16 is not supported on {self.device}, falling back to fp32")
+                self.precision = 'fp32'
+                return
+            self.model = self.model.to(torch.bfloat16)
+        elif self.precision != 'fp32':
+            raise ValueError(f"Unknown model precision: {self.precision}")
+        logger.info(f"Model precision: {self.precision}")
+
+    def set_field_vocabularies(self, vocabularies):
+        """Build the decoding grammar from {output field: [allowed values]}"""
+        self.grammar = FieldGrammar(self.tokenizer, vocabularies)
+        self.model_version = f"{self._base_version}-constrained-{self.grammar.fingerprint}"
+        logger.info(f"Constrained decoding enabled, max output length {self.grammar.max_length} tokens")
 
     def prepare_input(self, campaign, placement_name, dcm_name=''):
         """Prepare input text in the same format as training data"""
@@ -27,6 +124,19 @@ class PlacementPredictor:
             return f"Campaign: {campaign}, DCM Name: {dcm_name}, Placement Name: {placement_name}"
         return f"Campaign: {campaign}, Placement Name: {placement_name}"
 
+    def prepare_inputs(self, campaigns, placement_names, dcm_names=None):
+        """prepare_input over whole Series at once; returns an object array of prompts"""
+        campaigns = campaigns.map(str).to_numpy(dtype=object)
+        placement_names = placement_names.map(str).to_numpy(dtype=object)
+        prompts = "Campaign: " + campaigns + ", Placement Name: " + placement_names
+        if dcm_names is not None:
+            dcm_text = dcm_names.map(str).to_numpy(dtype=object)
+            # Same truthiness as prepare_input: '' and None mean no DCM name
+            has_dcm = (dcm_text != '') & ~(dcm_names.isna().to_numpy() & (dcm_text == 'None'))
+            with_dcm = "Campaign: " + campaigns + ", DCM Name: " + dcm_text + ", Placement Name: " + placement_names
+            prompts = np.where(has_dcm, with_dcm, prompts)
+        return prompts
+
     def parse_output(self, text):
         """Parse the model output into a dictionary"""
         parsed = {}
@@ -38,38 +148,284 @@ class PlacementPredictor:
             logger.error(f"Parsing error: {e}\nText: {text}")
         return parsed
 
+    def _token_budget_batches(self, input_texts):
+        """Group prompt indices by token length so each padded batch stays under max_batch_tokens"""
+        lengths = [
+            len(ids) for ids in self.tokenizer(
+                input_texts,
+                max_length=self.max_source_length,
+                truncation=True
+            )["input_ids"]
+        ]
+        batches = []
+        current = []
+        for idx in sorted(range(len(input_texts)), key=lengths.__getitem__):
+            # Ascending order, so the newest prompt is always the longest in the batch
+            if current and (len(current) + 1) * lengths[idx] > self.max_batch_tokens:
+                batches.append(current)
+                current = []
+            current.append(idx)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _generate(self, batch_texts, beams=True, scores=True):
+        """
+        Decode a batch; returns the texts and each row's confidence (lowest token probability),
+        or None for every row when scores is False
+        """
+        inputs = self.tokenizer(
+            batch_texts,
+            max_length=self.max_source_length,
+            truncation=True,
+            padding=True,
+            return_tensors="pt"
+        ).to(self.device)
+
+        generation_kwargs = {
+            'max_length': self.max_target_length,
+            'num_beams': 2,
+            'repetition_penalty': 2.5,
+            'length_penalty': 0.8,
+            'early_stopping': False
+        }
+        if not beams:
+            generation_kwargs = {'max_length': self.max_target_length, 'num_beams': 1, 'repetition_penalty': 2.5}
+        if self.grammar is not None:
+            # The grammar forces EOS after the last field, so stop beams as soon as it closes
+            generation_kwargs.update(
+                prefix_allowed_tokens_fn=self.grammar,
+                max_length=min(self.max_target_length, self.grammar.max_length)
+            )
+            if beams:
+                generation_kwargs['early_stopping'] = True
+
+        with torch.no_grad():
+            outputs = self.model.generate(
+                input_ids=inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                return_dict_in_generate=True,
+                output_logits=scores,
+                **generation_kwargs
+            )
+            texts = self.tokenizer.batch_decode(outputs.sequences, skip_special_tokens=True)
+            if not scores:
+                return texts, [None] * len(texts)
+            # Confidence comes from the raw logits: the processed scores carry the repetition
+            # penalty and the grammar mask, which would distort the model's own probabilities
+            token_scores = self.model.compute_transition_scores(
+                outputs.sequences, outputs.logits, getattr(outputs, 'beam_indices', None),
+                normalize_logits=True
+            )
+
+        # Padding after EOS doesn't count against the row
+        tokens = outputs.sequences[:, -token_scores.shape[1]:]
+        token_scores = token_scores.masked_fill(tokens == self.tokenizer.pad_token_id, 0.0)
+        confidences = token_scores.min(dim=1).values.exp().tolist()
+        return texts, confidences
+
+    def _decode(self, input_texts, batch_size=32, beams=True, scores=True):
+        if self.batching == 'token_budget':
+            batches = self._token_budget_batches(input_texts)
+        else:
+            batches = [
+                list(range(i, min(i + batch_size, len(input_texts))))
+                for i in range(0, len(input_texts), batch_size)
+            ]
+
+        # Write each batch back to its original position
+        predictions = [None] * len(input_texts)
+        confidences = [None] * len(input_texts)
+        for batch in batches:
+            decoded_preds, batch_confidences = self._generate(
+                [input_texts[i] for i in batch], beams=beams, scores=scores
+            )
+            for i, pred, confidence in zip(batch, decoded_preds, batch_confidences):
+                predictions[i] = pred
+                confidences[i] = confidence
+        return predictions, confidences
+
     def predict(self, input_texts, batch_size=32):
         if isinstance(input_texts, str):
             input_texts = [input_texts]
 
-        predictions = []
+        adaptive = self.decoding == 'adaptive'
+        scores = adaptive or self.score_confidence
+        predictions, confidences = self._decode(input_texts, batch_size, beams=not adaptive, scores=scores)
+        if adaptive:
+            unsure = [i for i, confidence in enumerate(confidences) if confidence < self.confidence_threshold]
+            logger.info(f"Adaptive decoding: re-running {len(unsure)} of {len(input_texts)} rows with beam search")
+            if unsure:
+                beam_preds, beam_confidences = self._decode([input_texts[i] for i in unsure], batch_size)
+                for i, pred, confidence in zip(unsure, beam_preds, beam_confidences):
+                    predictions[i] = pred
+                    confidences[i] = confidence
 
-        for i in range(0, len(input_texts), batch_size):
-            batch_texts = input_texts[i:i + batch_size]
+        results = []
+        for pred, confidence in zip(predictions, confidences):
+            parsed = self.parse_output(pred)
+            parsed[CONFIDENCE_FIELD] = round(confidence, 4) if confidence is not None else None
+            results.append(parsed)
+        return results
 
-            inputs = self.tokenizer(
-                batch_texts,
-                max_length=self.max_source_length,
-                truncation=True,
-                padding=True,
-                return_tensors="pt"
-            ).to(self.device)
-
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    input_ids=inputs["input_ids"],
-                    attention_mask=inputs["attention_mask"],
-                    max_length=self.max_target_length,
-                    num_beams=2,
-                    repetition_penalty=2.5,
-                    length_penalty=0.8,
-                    early_stopping=False
+class TieredPredictor:
+    """
+    Answers with a small distilled student model and escalates to the full model
+    only for rows where the student's confidence is below confidence_threshold or
+    its fields contradict the master file's placement groups.
+
+    Exposes the same interface as PlacementPredictor; everything except predict()
+    is served by the student, which must be created with score_confidence on.
+    """
+
+    def __init__(self, student, teacher, confidence_threshold=0.9):
+        self.student = student
+        self.teacher = teacher
+        self.confidence_threshold = confidence_threshold
+        self.model_version = f"tiered-{student.model_version}-{teacher.model_version}-{confidence_threshold}"
+
+    def __getattr__(self, name):
+        return getattr(self.student, name)
+
+    def _rows_to_escalate(self, predictions):
+        unsure = np.array([pred.get(CONFIDENCE_FIELD, 0.0) < self.confidence_threshold for pred in predictions], dtype=bool)
+        master_data = get_master_data()
+        if master_data is not None and len(master_data.group_index):
+            fields = pd.DataFrame.from_records(predictions, columns=['Placement Group', 'Tactic', 'Audience', 'Ad Type'])
+            unsure |= ~validation_status(fields.fillna(''), master_data.group_index).all(axis=1).to_numpy()
+        return np.flatnonzero(unsure).tolist()
+
+    def predict(self, input_texts, batch_size=32):
+        if isinstance(input_texts, str):
+            input_texts = [input_texts]
+        predictions = self.student.predict(input_texts, batch_size)
+        escalate = self._rows_to_escalate(predictions)
+        logger.info(f"Tiered prediction: escalating {len(escalate)} of {len(input_texts)} rows to the full model")
+        if escalate:
+            teacher_predictions = self.teacher.predict([input_texts[i] for i in escalate], batch_size)
+            for i, pred in zip(escalate, teacher_predictions):
+                predictions[i] = pred
+        return predictions
+
+    def close(self):
+        for predictor in (self.student, self.teacher):
+            if hasattr(predictor, 'close'):
+                predictor.close()
+
+def _model_signature(model_path):
+    """Return (name, size, mtime) of every file in the model directory so retrained weights trigger a reload"""
+    signature = []
+    for name in sorted(os.listdir(model_path)):
+        path = os.path.join(model_path, name)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            signature.append((name, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+def _model_version(model_path):
+    """Hash the contents of every file in the model directory; changes whenever the model is retrained"""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(model_path)):
+        path = os.path.join(model_path, name)
+        if os.path.isfile(path):
+            digest.update(name.encode())
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+    return digest.hexdigest()
+
+def _load_field_vocabularies():
+    """Allowed values per output field, from the reference tables"""
+    # Imported here so the predictor doesn't require the Snowflake client unless constrained decoding is on
+    from utils.snowflake_utils import get_reference_data
+    return vocabularies_from_reference(get_reference_data())
+
+def _load_predictor(model_path, tiers=1, score_confidence=False):
+    predictor = PlacementPredictor(model_path)
+    # Set before the pool is started, since its workers receive a copy of the predictor
+    if score_confidence:
+        predictor.score_confidence = True
+    if predictor.constrained:
+        predictor.set_field_vocabularies(_load_field_vocabularies())
+    # Optionally shard predictions across worker processes sharing the weights. Each tier
+    # gets its own pool, so together they never start more workers than there are cores.
+    num_processes = min(int(os.getenv('PREDICTOR_PROCESSES', '1')), available_cpus() // tiers)
+    if num_processes > 1:
+        try:
+            predictor = PredictorPool(predictor, num_processes)
+        except Exception as e:
+            logger.warning(f"Could not start inference workers, predicting in-process: {str(e)}")
+    return predictor
+
+def get_predictor(model_path=None):
+    """
+    Return the shared predictor for model_path, loading it only once per process.
+    When STUDENT_MODEL_DIR is set, the distilled student answers first and model_path
+    is only used for the rows it escalates (see TieredPredictor).
+    """
+    model_path = os.path.abspath(model_path or os.getenv('MODEL_DIR', './model_outputs'))
+    student_path = os.getenv('STUDENT_MODEL_DIR')
+    student_path = os.path.abspath(student_path) if student_path else None
+    key = (model_path, student_path)
+    signature = (_model_signature(model_path), _model_signature(student_path) if student_path else None)
+
+    with _registry_lock:
+        entry = _predictor_registry.get(key)
+        if entry is None or entry[0] != signature:
+            if entry is not None:
+                logger.info(f"Model files changed in {model_path}, reloading")
+            if entry is not None and hasattr(entry[1], 'close'):
+                entry[1].close()
+            tiers = 2 if student_path else 1
+            predictor = _load_predictor(model_path, tiers)
+            if student_path:
+                predictor = TieredPredictor(
+                    _load_predictor(student_path, tiers, score_confidence=True), predictor,
+                    confidence_threshold=float(os.getenv('STUDENT_CONFIDENCE_THRESHOLD', '0.9'))
                 )
+            _predictor_registry[key] = (signature, predictor)
+        return _predictor_registry[key][1]
+
+def warm_up_predictor(model_path=None):
+    """Load the model and run one dummy prediction so the first upload doesn't pay for it"""
+    start_time = datetime.now()
+    predictor = get_predictor(model_path)
+    predictor.predict(predictor.prepare_input('Campaign', 'Placement'))
+    logger.info(f"Model warm-up completed in {(datetime.now() - start_time).total_seconds():.2f} seconds")
+    return predictor
 
-            decoded_preds = self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
-            predictions.extend(decoded_preds)
+def get_prediction_cache():
+    """Return the shared on-disk prediction cache, or None if PREDICTION_CACHE_PATH is set empty"""
+    global _prediction_cache
+    cache_path = os.getenv('PREDICTION_CACHE_PATH', './cache/predictions.sqlite')
+    if not cache_path:
+        return None
+    with _registry_lock:
+        if _prediction_cache is None or _prediction_cache.path != cache_path:
+            max_entries = int(os.getenv('PREDICTION_CACHE_MAX_ENTRIES', '500000'))
+            _prediction_cache = PredictionCache(cache_path, max_entries=max_entries)
+        return _prediction_cache
 
-        return [self.parse_output(pred) for pred in predictions]
+def cached_predict(predictor, input_texts, cache=None):
+    """Answer prompts from the prediction cache and only send the misses to the model"""
+    cached = cache.get_many(predictor.model_version, input_texts) if cache else {}
+    misses = [text for text in input_texts if text not in cached]
+    logger.info(f"Prediction cache: {len(input_texts) - len(misses)} hits, {len(misses)} misses")
+    with _cache_stats_lock:
+        _cache_stats['hits'] += len(input_texts) - len(misses)
+        _cache_stats['misses'] += len(misses)
+
+    if misses:
+        new_predictions = dict(zip(misses, predictor.predict(misses)))
+        if cache:
+            cache.put_many(predictor.model_version, new_predictions)
+        cached.update(new_predictions)
+    return [cached[text] for text in input_texts]
+
+def prediction_cache_stats():
+    """Prompts answered from the prediction cache ('hits') and by the model ('misses') so far"""
+    with _cache_stats_lock:
+        return dict(_cache_stats)
 
 def process_file(df, missing_columns=None):
     """Process the uploaded file with the T5 model predictions"""
@@ -84,41 +440,61 @@ def process_file(df, missing_columns=None):
 
     processed_df = df.copy()
 
-    # Standardize column names for processing
-    temp_df = df.copy()
-    temp_df.columns = temp_df.columns.str.upper().str.replace(' ', '_')
-    
-    # Clean PLACEMENT_NAME column: remove text occurring after ":D"
-    #if 'PLACEMENT_NAME' in temp_df.columns:
-    #    temp_df['PLACEMENT_NAME'] = temp_df['PLACEMENT_NAME'].apply(
-    #        lambda x: x.split(":D")[0].strip() if isinstance(x, str) and ":D" in x else x
-    #    )
-    
- 
+    # Standardized column name -> original column name, so no renamed copy is needed
+    columns = {col.upper().replace(' ', '_'): col for col in df.columns}
     
     # Required input validation and prediction preparation 
     required_input_columns = ['CAMPAIGN', 'PLACEMENT_NAME']
     logger.info("Checking required columns...")
-    missing_required = [col for col in required_input_columns if col not in temp_df.columns]
+    missing_required = [col for col in required_input_columns if col not in columns]
     if missing_required:
         raise ValueError(f"Missing required column(s): {missing_required}")
+    campaigns = df[columns['CAMPAIGN']]
+    placement_names = df[columns['PLACEMENT_NAME']]
+    dcm_names = df[columns['DCM_CAMPAIGN_NAME']] if 'DCM_CAMPAIGN_NAME' in columns else None
     
-    # Initialize model and prepare input texts
-    model_dir = os.getenv('MODEL_DIR', './model_outputs')
-    predictor = PlacementPredictor(model_dir)
-    
-    # Prepare input texts
-    input_texts = []
-    for _, row in temp_df.iterrows():
-        dcm_name = row.get('DCM_CAMPAIGN_NAME', '')
-        input_texts.append(predictor.prepare_input(
-            row['CAMPAIGN'],
-            row['PLACEMENT_NAME'],
-            dcm_name
-        ))
-    
-    # Get predictions
-    predictions = predictor.predict(input_texts)
+    # Answer placements already mapped in the master file directly; only the rest go to the model
+    master_data = get_master_data()
+    if master_data is not None:
+        predictions = master_data.lookup(normalize_keys(campaigns), normalize_keys(placement_names))
+    else:
+        predictions = np.full(len(df), None, dtype=object)
+    unmapped = pd.isna(predictions)
+    model_rows = np.flatnonzero(unmapped)
+    logger.info(f"Master lookup answered {len(predictions) - len(model_rows)} of {len(predictions)} rows")
+    sources = np.where(unmapped, 'model', 'lookup').astype(object)
+
+    # Near-variants of mapped placements take their closest neighbour's mapping instead of being generated
+    neighbor_index = get_neighbor_index() if len(model_rows) and NEIGHBOR_SKIP_SIMILARITY <= 1 else None
+    if neighbor_index is not None:
+        matches, similarities = neighbor_index.best_matches(
+            campaigns.iloc[model_rows], placement_names.iloc[model_rows], NEIGHBOR_SKIP_SIMILARITY
+        )
+        matched = np.flatnonzero(pd.notna(matches))
+        for i in matched:
+            predictions[model_rows[i]] = dict(matches[i], **{CONFIDENCE_FIELD: round(float(similarities[i]), 4)})
+        sources[model_rows[matched]] = 'neighbour'
+        model_rows = np.delete(model_rows, matched)
+        logger.info(f"Neighbour index answered {len(matched)} rows at similarity >= {NEIGHBOR_SKIP_SIMILARITY}")
+
+    if len(model_rows):
+        # Reuse the process-wide model instead of loading it for every upload
+        predictor = get_predictor()
+
+        # Prepare input texts
+        input_texts = predictor.prepare_inputs(
+            campaigns.iloc[model_rows],
+            placement_names.iloc[model_rows],
+            dcm_names.iloc[model_rows] if dcm_names is not None else None
+        )
+
+        # Get predictions once per unique prompt, then scatter back to every row
+        codes, unique_texts = pd.factorize(input_texts)
+        logger.info(f"Deduplicated {len(input_texts)} rows to {len(unique_texts)} unique prompts "
+                    f"({len(input_texts) / len(unique_texts):.1f}x)")
+        unique_predictions = np.empty(len(unique_texts), dtype=object)
+        unique_predictions[:] = cached_predict(predictor, list(unique_texts), get_prediction_cache())
+        predictions[model_rows] = unique_predictions[codes]
     
     # Mapping of model output fields to DataFrame columns
     field_mapping = {
@@ -129,13 +505,53 @@ def process_file(df, missing_columns=None):
         'Ad Type': 'Ad Type'
     }
     
-    # Update columns with predictions
+    # Unpack every prediction dict into the field columns in one pass
+    fields = pd.DataFrame.from_records(list(predictions), columns=list(field_mapping) + [CONFIDENCE_FIELD])
     for model_field, df_column in field_mapping.items():
-        # Add column if it doesn't exist
-        if df_column not in processed_df.columns:
-            processed_df[df_column] = ''
-        # Update with predictions
-        processed_df[df_column] = [pred.get(model_field, '') for pred in predictions]
+        processed_df[df_column] = fields[model_field].fillna('').to_numpy()
+    processed_df['Mapping Source'] = sources
+    # Master lookups are exact matches; neighbour rows carry their similarity
+    processed_df[CONFIDENCE_FIELD] = np.where(unmapped, pd.to_numeric(fields[CONFIDENCE_FIELD], errors='coerce'), 1.0)
     
     logger.info(f"File processing completed in {(datetime.now() - start_time).total_seconds():.2f} seconds")
-    return processed_df
\ No newline at end of file
+    return processed_df
+
+def clean_input(df):
+    """Clean an uploaded chunk in place: string Media IDs, ':D' tails, missing placement names"""
+    # Convert Media ID to string if it exists
+    if 'Media ID' in df.columns:
+        df['Media ID'] = df['Media ID'].astype(str)
+
+    # Clean PLACEMENT_NAME column: remove text occurring after ":D"
+    if 'Placement Name' in df.columns:
+        names = df['Placement Name']
+        has_text = names.dtype == object or isinstance(names.dtype, pd.StringDtype)
+        if not has_text:
+            # An all-missing column is read as float; it has to hold the names filled in below
+            names = df['Placement Name'] = names.astype(object)
+        tagged = names.str.contains(":D", regex=False, na=False).to_numpy(dtype=bool) if has_text else None
+        if tagged is not None and tagged.any():
+            df.loc[tagged, 'Placement Name'] = df.loc[tagged, 'Placement Name'].str.split(":D", n=1).str[0].str.strip()
+
+        # Fill missing placement names from the master file by Media ID
+        missing_mask = df["Placement Name"].isna() | (df["Placement Name"].astype(str).str.strip() == "")
+        if missing_mask.any() and 'Media ID' in df.columns:
+            master_data = get_master_data()
+            if master_data is not None:
+                df.loc[missing_mask, "Placement Name"] = df.loc[missing_mask, "Media ID"].map(master_data.media_id_map)
+                logger.info("Filled missing Placement Name values using lookup from your_data.csv.")
+            else:
+                logger.warning("your_data.csv not found; missing placement names remain unfilled.")
+    return df
+
+def iter_process_chunks(chunks, output_path=None):
+    """
+    Clean and predict an iterable of DataFrame chunks, yielding each processed
+    chunk as soon as it is done. When output_path is given, processed chunks are
+    also appended to that CSV so callers don't need to keep them in memory.
+    """
+    for i, chunk in enumerate(chunks):
+        processed_chunk = process_file(clean_input(chunk))
+        if output_path:
+            processed_chunk.to_csv(output_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        yield processed_chunk
@@ -0,0 +1,136 @@
+import os
+import queue
+import logging
+import threading
+import torch
+import torch.multiprocessing as mp
+
+logger = logging.getLogger(__name__)
+
+# Longest a call waits for the next shard before treating the workers as stuck
+RESULT_TIMEOUT_SECONDS = float(os.getenv('PREDICTOR_TIMEOUT_SECONDS', '600'))
+# How often a waiting call checks that every worker is still alive
+_POLL_SECONDS = 1.0
+
+def available_cpus():
+    """CPUs this process may run on (respects affinity masks and container CPU sets)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def _worker_main(predictor, num_threads, tasks, results):
+    """Worker process loop: predict shards from tasks until a None sentinel arrives"""
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(1)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        shard_id, texts = task
+        try:
+            results.put((shard_id, predictor.predict(texts), None))
+        except Exception as e:
+            results.put((shard_id, None, str(e)))
+
+class PredictorPool:
+    """
+    Runs PlacementPredictor.predict across worker processes that share one copy
+    of the model weights. The model is loaded once in this process, moved to shared
+    memory and handed to spawned workers, so memory doesn't grow with the worker
+    count. Each worker gets available cores // num_workers intra-op threads.
+
+    Exposes the same interface as PlacementPredictor; everything except predict()
+    is served by the local predictor. If a worker dies or stops answering, the
+    workers are stopped and predictions continue in this process.
+    """
+
+    def __init__(self, predictor, num_workers, shard_size=64):
+        if predictor.device.type != 'cpu' or predictor.backend != 'torch' or predictor.precision == 'int8':
+            raise ValueError("The predictor pool needs an fp32/bf16 torch model on CPU")
+        self.predictor = predictor
+        self.num_workers = num_workers
+        self.shard_size = shard_size
+        self.threads_per_worker = max(1, available_cpus() // num_workers)
+        self._lock = threading.Lock()
+
+        predictor.model.share_memory()
+        context = mp.get_context('spawn')
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._workers = [
+            context.Process(
+                target=_worker_main,
+                args=(predictor, self.threads_per_worker, self._tasks, self._results),
+                daemon=True
+            )
+            for _ in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+        logger.info(f"Started {num_workers} inference workers with {self.threads_per_worker} threads each")
+
+    def __getattr__(self, name):
+        return getattr(self.predictor, name)
+
+    def _next_result(self):
+        """Next finished shard; raises RuntimeError if a worker died or none answered in time"""
+        waited = 0.0
+        while True:
+            try:
+                return self._results.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                waited += _POLL_SECONDS
+            dead = [worker.pid for worker in self._workers if not worker.is_alive()]
+            if dead:
+                raise RuntimeError(f"Inference worker(s) {dead} exited")
+            if waited >= RESULT_TIMEOUT_SECONDS:
+                raise RuntimeError(f"No inference result within {RESULT_TIMEOUT_SECONDS:.0f}s")
+
+    def predict(self, input_texts, batch_size=32):
+        if isinstance(input_texts, str):
+            input_texts = [input_texts]
+        input_texts = list(input_texts)
+
+        # One call at a time; each call already keeps every worker busy
+        with self._lock:
+            if not self._workers:
+                return self.predictor.predict(input_texts, batch_size)
+
+            # Shard in token-length order so each worker's batches pad as little as in-process batching
+            order = [idx for batch in self.predictor._token_budget_batches(input_texts) for idx in batch]
+            shards = [order[i:i + self.shard_size] for i in range(0, len(order), self.shard_size)]
+            for shard_id, shard in enumerate(shards):
+                self._tasks.put((shard_id, [input_texts[idx] for idx in shard]))
+
+            predictions = [None] * len(input_texts)
+            errors = []
+            try:
+                for _ in shards:
+                    shard_id, shard_predictions, error = self._next_result()
+                    if error:
+                        errors.append(error)
+                        continue
+                    for idx, prediction in zip(shards[shard_id], shard_predictions):
+                        predictions[idx] = prediction
+            except RuntimeError as e:
+                logger.error(f"{str(e)}; stopping the inference workers and predicting in-process")
+                self._terminate()
+                return self.predictor.predict(input_texts, batch_size)
+        if errors:
+            raise RuntimeError(f"Inference worker failed: {errors[0]}")
+        return predictions
+
+    def _terminate(self):
+        for worker in self._workers:
+            worker.terminate()
+        for worker in self._workers:
+            worker.join(timeout=10)
+        self._workers = []
+
+    def close(self):
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=10)
+        self._workers = []
+        logger.info("Stopped inference workers")
@@ -1,16 +1,29 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import uuid
 from datetime import datetime
 import re
 from io import StringIO
 import logging
-from utils.file_processor import process_file
-import os
+from utils.job_queue import get_job_queue, QUEUED, RUNNING, COMPLETED, FAILED
+import time
+from utils.master_data import get_master_data, validation_status
+from utils.export_utils import export_bytes, EXPORT_FORMATS
+from utils.edit_log import EditLog
+from utils.search_index import SEARCH_COLUMNS
+from utils.session_memory import SessionFrames
+from utils.neighbor_index import get_neighbor_index
 #from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, DataReturnMode, StAggridTheme
 
 logger = logging.getLogger(__name__)
 
+# Rows styled per page in the placement group validation table
+VALIDATION_PAGE_SIZE = 500
+
+# Rows shown per page in the data editor
+EDITOR_PAGE_SIZE = 200
+
 def highlight_differences(row):
 
     """Highlight differences between actual and predicted values"""
@@ -23,80 +36,136 @@ def highlight_differences(row):
                 styles[i] = 'background-color: yellow'
     return styles
 
-def validate_placement_groups(df):
+def validate_placement_groups(df, page=0, page_size=VALIDATION_PAGE_SIZE, status=None):
     """
-    Reads the master mediaplan file and returns a styled DataFrame in which 
-    the cells for Placement Group, Tactic, Audience, and Ad Type are validated.
-    
+    Validates Placement Group, Tactic, Audience, and Ad Type against the master
+    mediaplan file and returns (styled page of df, boolean status matrix for all rows).
+    Only the requested page is styled; pass the status returned for the same df to reuse it.
     """
-    valid_path = os.path.join("data_db", "your_data.csv")
-    if os.path.exists(valid_path):
-        valid_df = pd.read_csv(valid_path)
-        group_map = {}
-        for _, row in valid_df.iterrows():
-            pg = str(row.get("PLACEMENT_GROUP", "")).strip()
-            if pg and pg not in group_map:
-                group_map[pg] = {
-                    "Tactic": str(row.get("TACTIC", "")).strip(),
-                    "Audience": str(row.get("AUDIENCE", "")).strip(),
-                    "Ad Type": str(row.get("AD_TYPE", "")).strip()
-                }
-    
-        def highlight_validations(row):
-            styles = [''] * len(row)
-            cols = row.index.tolist()
-    
-            # Get the row values from the processed DataFrame
-            pg_val = str(row.get("Placement Group", "")).strip()
-            tactic_val = str(row.get("Tactic", "")).strip()
-            audience_val = str(row.get("Audience", "")).strip()
-            ad_type_val = str(row.get("Ad Type", "")).strip()
-    
-            # Define style colors
-            green = "background-color: green"
-            red = "background-color: red"
-    
-            if pg_val in group_map:
-                ref = group_map[pg_val]
-                # Highlight individual cells
-                for i, col in enumerate(cols):
-                    if col == "Placement Group":
-                        styles[i] = green
-                    elif col == "Tactic":
-                        styles[i] = green if tactic_val == ref.get("Tactic", "") else red
-                    elif col == "Audience":
-                        styles[i] = green if audience_val == ref.get("Audience", "") else red
-                    elif col == "Ad Type":
-                        styles[i] = green if ad_type_val == ref.get("Ad Type", "") else red
-            else:
-                # If the placement group is not found in the master, mark validation cells as red.
-                for i, col in enumerate(cols):
-                    if col in ["Placement Group", "Tactic", "Audience", "Ad Type"]:
-                        styles[i] = red
-            return styles
-    
-        return df.style.apply(highlight_validations, axis=1)
-    else:
+    master_data = get_master_data()
+    page_df = df.iloc[page * page_size:(page + 1) * page_size]
+    if master_data is None:
         logger.warning("your_data.csv not found for placement group validation.")
-        return df
+        return page_df, None
+
+    if status is None:
+        status = validation_status(df, master_data.group_index)
+    page_status = status.iloc[page * page_size:(page + 1) * page_size]
+
+    def highlight_validations(page):
+        styles = pd.DataFrame('', index=page.index, columns=page.columns)
+        if len(page_status.columns):
+            styles[page_status.columns] = np.where(
+                page_status, "background-color: green", "background-color: red"
+            )
+        return styles
+
+    return page_df.style.apply(highlight_validations, axis=None), status
+
+def display_download(df, version, key):
+    """
+    Download controls that serialize df only after the user asks for a file.
+    version must change whenever df changes; bytes are memoized per version and format.
+    """
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        fmt = st.selectbox("Format", list(EXPORT_FORMATS), key=f"{key}-format",
+                           help="csv.gz and parquet are much smaller for large files")
+    ready_key = f"{key}-ready"
+    with col2:
+        st.write("")
+        if st.button("Prepare download", key=f"{key}-prepare"):
+            st.session_state[ready_key] = (version, fmt)
+
+    if st.session_state.get(ready_key) == (version, fmt):
+        extension, mime = EXPORT_FORMATS[fmt]
+        st.download_button(
+            label="📥 Download Updated Data",
+            data=export_bytes(df, fmt, version=version),
+            file_name=f"updated_data{extension}",
+            mime=mime,
+            key=f"{key}-button"
+        )
+
+def display_page(df, key, page_size=EDITOR_PAGE_SIZE):
+    """Show one page of df with a page selector"""
+    page_count = max(1, -(-len(df) // page_size))
+    page = st.number_input(
+        f"Page (of {page_count}, {len(df):,} rows)", min_value=1, max_value=page_count, value=1, key=key
+    ) - 1
+    st.dataframe(df.iloc[page * page_size:(page + 1) * page_size], use_container_width=True)
+
+def display_memory_footprint(frames, extra=()):
+    """Show how much memory this session's DataFrames hold"""
+    footprint = frames.footprint(extra)
+    spilled = frames.spilled_bytes()
+    st.sidebar.metric(
+        "Session memory", f"{footprint / 1e6:.1f} MB",
+        help=f"Budget {frames.budget_bytes / 1e6:.0f} MB; {spilled / 1e6:.1f} MB of older versions spilled to disk"
+    )
+    logger.debug(f"Session {st.session_state.get('session_id')} holds {footprint} bytes in memory, {spilled} spilled")
+
+def display_neighbours(edit_log, page_positions):
+    """Show the historical placements most similar to one row of the current editor page"""
+    neighbor_index = get_neighbor_index()
+    if neighbor_index is None or len(page_positions) == 0:
+        return
+    with st.expander("Similar historical placements"):
+        row = st.number_input(
+            "Row on this page", min_value=0, max_value=len(page_positions) - 1, value=0, key='neighbour_row'
+        )
+        selected = edit_log.page(page_positions[row:row + 1]).iloc[0]
+        campaign, name = selected['Campaign'], selected['Placement Name']
+        st.caption(f"Closest mapped placements to: {name} (campaign {campaign})")
+        st.dataframe(neighbor_index.neighbours(campaign, name, k=5), use_container_width=True)
+
+def _record_editor_changes(edit_log, page_positions, changes):
+    """Record a page's editor delta in the edit log and keep the stored final frame in step"""
+    if not edit_log.apply_editor_changes(page_positions, changes):
+        return False
+    frames = st.session_state.frames
+    final_df = edit_log.materialize()
+    if final_df is edit_log.base:
+        frames.pop('final_df')  # no edits; the edit log already holds this frame
+    else:
+        # Spilling it must also drop the edit log's cached copy, or it would free nothing
+        frames.put('final_df', final_df, release=edit_log.release_materialized)
+    st.session_state.changes_saved = True
+    return True
 
-def display_edit_interface(df):
+def _apply_pending_edits():
+    """
+    on_change callback of the view widgets: runs before the rerun builds the new page,
+    while the old editor's delta is still in session state, so typed but unapplied
+    edits are kept when the page, sort or search changes
+    """
+    view = st.session_state.get('editor_view')
+    if view is None or 'edit_log' not in st.session_state:
+        return
+    editor_key, page_positions = view
+    if _record_editor_changes(st.session_state.edit_log, page_positions, st.session_state.get(editor_key, {})):
+        st.session_state.changes_applied_notice = True
+
+def display_edit_interface(df, search_index=None):
     """Display the edit interface"""
     # Initialize all session state variables
-    if 'edited_df' not in st.session_state:
-        # Convert Media ID to string to avoid Arrow serialization issues
-        df = df.copy()
-        if 'Media ID' in df.columns:
+    frames = st.session_state.frames
+    if 'edit_log' not in st.session_state:
+        # Convert Media ID to string to avoid Arrow serialization issues; other columns stay shared
+        df = df.copy(deep=False)
+        if 'Media ID' in df.columns and df['Media ID'].dtype == object:
             df['Media ID'] = df['Media ID'].astype(str)
-        st.session_state.edited_df = df
-    if 'original_df' not in st.session_state:
-        st.session_state.original_df = df.copy()
+        # The base frame is never modified (it is also the unedited original); edits are recorded as a per-cell delta log
+        # The job's search index is shared by every session; each edit log records its own edits in an overlay
+        st.session_state.edit_log = EditLog(df, search_index)
+        # The edit log now holds the processed frame, so spilling the stored copy would free nothing
+        frames.pop('processed_df')
     if 'expanded_rows' not in st.session_state:
         st.session_state.expanded_rows = set()
     if 'changes_saved' not in st.session_state:
         st.session_state.changes_saved = False
-    if 'final_df' not in st.session_state:
-        st.session_state.final_df = None
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = str(uuid.uuid4())
     
     #st.subheader("Interactive Data Editor")
 
@@ -108,57 +177,83 @@ def display_edit_interface(df):
         st.subheader("Interactive Data Editor")
         st.markdown("Double click on a cell to edit it. Press 'Apply Changes' to save your changes.")
         # Search and filter
-        col1, col2 = st.columns([3, 1])
+        col1, col2, col3 = st.columns([3, 2, 1])
         with col1:
-            search_term = st.text_input("🔍 Search Placements", help="Filter rows by placement name or campaign")
+            search_term = st.text_input(
+                "🔍 Search Placements", help="Filter rows containing this text in the selected columns",
+                on_change=_apply_pending_edits
+            )
         with col2:
-            sort_by = st.selectbox("Sort by", ["Campaign", "Placement Name", "Publisher"])
-        
-        # Filter and sort data
-        filtered_df = st.session_state.edited_df.copy()
-        if search_term:
-            mask = (
-                filtered_df['Placement Name'].str.contains(search_term, case=False, na=False) |
-                filtered_df['Campaign'].str.contains(search_term, case=False, na=False)
+            search_columns = st.multiselect(
+                "Search in", SEARCH_COLUMNS, default=['Placement Name', 'Campaign'], on_change=_apply_pending_edits
+            )
+        with col3:
+            sort_by = st.selectbox(
+                "Sort by", ["Campaign", "Placement Name", "Publisher", "Confidence"],
+                help="Confidence sorts the least certain predictions first", on_change=_apply_pending_edits
             )
-            filtered_df = filtered_df[mask]
-        filtered_df = filtered_df.sort_values(sort_by).reset_index(drop=True)
+        
+        # Filter and sort as row positions into the edit log; only the visible page is built
+        edit_log = st.session_state.edit_log
+        positions = edit_log.view(sort_by=sort_by, search_term=search_term, search_columns=search_columns)
+        page_count = max(1, -(-len(positions) // EDITOR_PAGE_SIZE))
+        page = st.number_input(
+            f"Page (of {page_count}, {len(positions):,} rows)",
+            min_value=1, max_value=page_count, value=1, key='editor_page', on_change=_apply_pending_edits
+        ) - 1
+        page_positions = positions[page * EDITOR_PAGE_SIZE:(page + 1) * EDITOR_PAGE_SIZE]
         
         # Define which columns are editable
         editable_columns = ['Placement Name', 'Publisher', 'Placement Group', 'Tactic', 'Audience', 'Ad Type']
         column_config = {col: st.column_config.TextColumn(col, width="medium") for col in editable_columns}
+        column_config['Confidence'] = st.column_config.ProgressColumn(
+            'Confidence', help="Model confidence in the prediction; master file matches are 1.0, "
+                 "neighbour matches show their similarity",
+            min_value=0.0, max_value=1.0, format="%.2f"
+        )
         
-        # Display editable dataframe
-        edited_df = st.data_editor(
-            filtered_df,
+        # Display editable page; the widget key changes with the view so its delta always matches page_positions
+        editor_key = f"editor-{edit_log.version}-{sort_by}-{search_term}-{','.join(search_columns)}-{page}"
+        # Changing the view switches to a new key; _apply_pending_edits records this page's delta first
+        st.session_state.editor_view = (editor_key, page_positions)
+        st.data_editor(
+            edit_log.page(page_positions),
             column_config=column_config,
             num_rows="dynamic",
             use_container_width=True,
             height=500,
-            disabled=["Campaign"]  # Make Campaign column read-only
+            disabled=["Campaign", "Mapping Source", "Confidence"],  # Make Campaign, Mapping Source and Confidence read-only
+            key=editor_key
         )
         
         if st.button("Apply Changes"):
-            st.session_state.edited_df = edited_df
-            st.session_state.final_df = edited_df
+            _record_editor_changes(edit_log, page_positions, st.session_state.get(editor_key, {}))
             st.session_state.changes_saved = True
+            st.session_state.changes_applied_notice = True
+            # Rerun so the editor is rebuilt from the log under its new key
+            st.rerun()
+        if st.session_state.pop('changes_applied_notice', False):
             st.success("Changes applied!")
+
+        display_neighbours(edit_log, page_positions)
     
+    edited_df = frames.get('final_df') if 'final_df' in frames else st.session_state.edit_log.materialize()
+    display_memory_footprint(frames, extra=(st.session_state.edit_log.rows, edited_df))
+
     with tab2:
-        if st.session_state.edited_df is not None:
+        if edited_df is not None:
             st.success("✅ Review your changes below.")
             
-            # Display the updated dataframe
+            # Display one page of the updated dataframe; sending every row would make each rerun O(rows)
             st.markdown("##### Updated Data Preview")
-            st.dataframe(st.session_state.edited_df, use_container_width=True)
+            display_page(edited_df, key='preview_page')
             
-            # Download button for changes
-            st.download_button(
-                label="📥 Download Updated Data",
-                data=st.session_state.edited_df.to_csv(index=False),
-                file_name="updated_data.csv",
-                mime="text/csv",
-                key='download-csv'
+            # Download controls; the file is only built when requested
+            display_download(
+                edited_df,
+                # The job ID is unique per upload; the edit counter restarts at 0 for every new file
+                version=(st.session_state.job_id, st.session_state.edit_log.version),
+                key='download'
             )
         else:
             st.info("💡 Make changes in the Data Editor tab to see them here.")
@@ -166,7 +261,19 @@ def display_edit_interface(df):
     # When displaying the data, validate and highlight Placement Group entries:
     st.markdown("### Validate Placement Groups")
     st.markdown("This will highlight in green any placement groups that are found in the master mediaplan file.")
-    validated_df = validate_placement_groups(st.session_state.edited_df)
+    validation_df = edited_df
+    page_count = max(1, -(-len(validation_df) // VALIDATION_PAGE_SIZE))
+    page = st.number_input("Page", min_value=1, max_value=page_count, value=1, key='validation_page') - 1
+    # Validated once per edit version; reruns only style the visible page
+    status_version = (st.session_state.job_id, st.session_state.edit_log.version)
+    cached = st.session_state.get('validation_status')
+    validated_df, status = validate_placement_groups(
+        validation_df, page=page, status=cached[1] if cached and cached[0] == status_version else None
+    )
+    st.session_state.validation_status = (status_version, status)
+    if status is not None:
+        st.caption(f"{int(status.all(axis=1).sum())} of {len(status)} rows fully match the master file "
+                   f"(page {page + 1} of {page_count})")
     st.dataframe(validated_df)
 
 def display_mapper_interface():
@@ -185,8 +292,8 @@ def display_mapper_interface():
     
 
     # Initialize all session state variables
-    if 'processed_df' not in st.session_state:
-        st.session_state.processed_df = None
+    if 'frames' not in st.session_state:
+        st.session_state.frames = SessionFrames()
     if 'current_file_name' not in st.session_state:
         st.session_state.current_file_name = None
     if 'changes_saved' not in st.session_state:
@@ -197,85 +304,82 @@ def display_mapper_interface():
         type=['csv', 'xlsx'],
         help="Upload a CSV or Excel file"
     )
+    queue = get_job_queue()
     
-    if uploaded_file:
-        try:
-            file_changed = (
-                st.session_state.current_file_name != uploaded_file.name
-            )
-            
-            if file_changed:
-                # Read and process the file
-                if uploaded_file.name.endswith('.csv'):
-                    uploaded_file.seek(0)
-                    original_df = pd.read_csv(uploaded_file)
-                elif uploaded_file.name.endswith('.xlsx'):
-                    uploaded_file.seek(0)
-                    try:
-                        original_df = pd.read_excel(uploaded_file, engine='openpyxl')
-                    except Exception as e:
-                        st.error("There was an error reading the Excel file. Please ensure it is a valid .xlsx file.")
-                        logger.error("Error reading Excel file", exc_info=True)
-                        return
-                else:
-                    st.error("Unsupported file type. Please upload a CSV or XLSX file.")
-                    return
-                
-                original_df2 = original_df.copy()
-
-                with st.spinner("Cleaning data..."):
-                    # Convert Media ID to string if it exists
-                    if 'Media ID' in original_df.columns:
-                        original_df['Media ID'] = original_df['Media ID'].astype(str)
+    try:
+        if uploaded_file and st.session_state.current_file_name != uploaded_file.name:
+            # Predictions run as a background job so this session never blocks on the model
+            job_id = queue.submit(uploaded_file.getvalue(), uploaded_file.name, st.session_state.get('username'))
+            st.session_state.current_file_name = uploaded_file.name
+            st.session_state.job_id = job_id
+            st.session_state.changes_saved = False  # Reset changes_saved flag
+            st.session_state.frames.clear()
+            for key in ['edit_log', 'editor_view', 'confirmed_job', 'download-ready']:
+                st.session_state.pop(key, None)
+            # Keep the job in the URL so a browser refresh can pick it back up
+            st.query_params['job'] = job_id
 
-                
-                    # Clean PLACEMENT_NAME column: remove text occurring after ":D"
-                    if 'Placement Name' in original_df.columns:
-                        original_df['Placement Name'] = original_df['Placement Name'].apply(
-                            lambda x: x.split(":D")[0].strip() if isinstance(x, str) and ":D" in x else x
-                        )
-
-                # --- VLOOKUP STEP FOR MISSING PLACEMENT_NAME ---
-                if 'Placement Name' in original_df.columns:
-                    missing_mask = original_df["Placement Name"].isna() | (original_df["Placement Name"].astype(str).str.strip() == "")
-                    if missing_mask.any():
-                        with st.spinner("Looking up missing placement names..."):
-                            dcm_path = os.path.join("data_db", "your_data.csv")
-                            if os.path.exists(dcm_path):
-                                dcm_df = pd.read_csv(dcm_path)
-                                # Ensure the lookup key in dcm_df is a string to match "Media ID"
-                                dcm_df["PLACEMENT_ID_AD_SET_ID"] = dcm_df["PLACEMENT_ID_AD_SET_ID"].astype(str)
-                                mapping = dcm_df.set_index("PLACEMENT_ID_AD_SET_ID")["PLACEMENT_NAME_AD_SET_NAME"].to_dict()
-                                # Map using "Media ID" from original_df cast as string
-                                original_df.loc[missing_mask, "Placement Name"] = (
-                                    original_df.loc[missing_mask, "Media ID"].astype(str).map(mapping)
-                                )
-                                logger.info("Filled missing Placement Name values using lookup from your_data.csv.")
-                            else:
-                                logger.warning("your_data.csv not found; missing placement names remain unfilled.")
-                # --- END VLOOKUP STEP ---
+        job_id = st.session_state.get('job_id') or st.query_params.get('job')
+        if not job_id:
+            return
+        job = queue.get(job_id)
+        if job is None:
+            st.warning("This processing job is no longer available. Please upload the file again.")
+            st.query_params.pop('job', None)
+            st.session_state.pop('job_id', None)
+            return
+        st.session_state.job_id = job_id
 
-                
-                # Process the file
-                with st.spinner("Processing file with AI predictions..."):
-                    processed_df = process_file(original_df)
-                
-                st.session_state.processed_df = processed_df
-                st.session_state.current_file_name = uploaded_file.name
-                st.session_state.changes_saved = False  # Reset changes_saved flag
-                
+        if job.status in (QUEUED, RUNNING):
+            st.progress(
+                job.progress,
+                text="Waiting for a model worker..." if job.status == QUEUED else
+                f"Processing file with AI predictions... {job.rows_done:,} of ~{job.total_rows:,} rows"
+            )
+            if st.button("Cancel processing"):
+                queue.cancel(job_id)
+                st.rerun()
+            if job.preview is not None:
+                # First rows are reviewable while the rest are still being predicted
+                st.markdown("##### First processed rows")
+                st.dataframe(job.preview, use_container_width=True)
+            time.sleep(1)
+            st.rerun()
+        elif job.status == FAILED:
+            st.error(f"Error processing file: {job.error}")
+        elif job.status != COMPLETED:
+            st.info("Processing was cancelled.")
+            if uploaded_file and st.button("Process again"):
+                st.session_state.current_file_name = None
+                st.rerun()
+        elif st.session_state.get('confirmed_job') == job_id and 'edit_log' in st.session_state:
+            display_edit_interface(None, job.search_index)
+        else:
+            frames = st.session_state.frames
+            if 'processed_df' not in frames:
+                result = queue.load_result(job_id)
+                if result is None:
+                    st.warning("The processed data is no longer available. Please upload the file again.")
+                    return
+                # Spilling this session's copy also parks the job's on disk, so it actually frees the memory
+                frames.put('processed_df', result, release=lambda: queue.release_result(job_id))
+            processed_df = frames.get('processed_df')
+            
+            if st.session_state.get('confirmed_job') != job_id:
                 # Show preview
                 tab1, tab2 = st.tabs(["Original Data", "Processed Data"])
                 with tab1:
-                    st.dataframe(original_df2, use_container_width=True)
+                    st.caption(f"First {len(job.original_preview):,} rows of the upload")
+                    st.dataframe(job.original_preview, use_container_width=True)
                 with tab2:
-                    st.dataframe(processed_df, use_container_width=True)
+                    display_page(processed_df, key='processed_page')
                 
                 if st.button("Confirm and Continue", type="primary"):
-                    display_edit_interface(st.session_state.processed_df)
+                    st.session_state.confirmed_job = job_id
+                    display_edit_interface(processed_df, job.search_index)
             else:
-                display_edit_interface(st.session_state.processed_df)
+                display_edit_interface(processed_df, job.search_index)
             
-        except Exception as e:
-            st.error(f"Error processing file: {str(e)}")
-            logger.error(f"File processing error: {str(e)}", exc_info=True)
\ No newline at end of file
+    except Exception as e:
+        st.error(f"Error processing file: {str(e)}")
+        logger.error(f"File processing error: {str(e)}", exc_info=True)
@@ -0,0 +1,225 @@
+import pandas as pd
+import io
+import os
+import uuid
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from utils.file_processor import iter_process_chunks
+from utils.upload_reader import iter_file_chunks, estimate_row_count, UPLOAD_COLUMNS
+from utils.snowflake_utils import record_job_state
+from utils.search_index import SearchIndex
+from utils.session_memory import compact_frame
+from utils.export_utils import write_parquet
+
+logger = logging.getLogger(__name__)
+
+# Job states, in lifecycle order
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = {COMPLETED, FAILED, CANCELLED}
+
+# Raw upload rows shown next to the processed data
+ORIGINAL_PREVIEW_ROWS = 1000
+
+# Results no session holds in memory are parked here until the job is evicted
+JOB_SPILL_DIR = os.getenv('JOB_SPILL_DIR', './cache/jobs')
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+class CancelledError(Exception):
+    pass
+
+class PredictionJob:
+    """State of one file submitted for prediction"""
+
+    def __init__(self, file_bytes, filename, submitted_by=None):
+        self.id = str(uuid.uuid4())
+        self.filename = filename
+        self.submitted_by = submitted_by
+        self.status = QUEUED
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self.rows_done = 0
+        self.total_rows = 0
+        self.original_preview = None  # first raw rows of the upload
+        self.preview = None  # first processed chunk, reviewable before the job finishes
+        self.result = None
+        self.result_path = None  # Parquet copy of result once released from memory
+        self.search_index = None  # built once over result for the editor's filter
+        self.error = None
+        self._file_bytes = file_bytes
+        self._cancel_event = threading.Event()
+
+    @property
+    def progress(self):
+        if self.status == COMPLETED:
+            return 1.0
+        return min(self.rows_done / self.total_rows, 1.0) if self.total_rows else 0.0
+
+    def cancel(self):
+        self._cancel_event.set()
+
+def _with_original_preview(job, chunks):
+    """Pass raw chunks through, keeping the first rows of the upload as the job's original preview"""
+    for chunk in chunks:
+        if job.original_preview is None:
+            # Copied because clean_input modifies the chunk in place
+            job.original_preview = chunk.head(ORIGINAL_PREVIEW_ROWS).copy()
+        yield chunk
+
+class JobQueue:
+    """
+    Runs prediction jobs on a small local thread pool. All jobs share the
+    process-wide predictor, so concurrent users don't each load a model.
+    Finished jobs are kept (with their results) until max_finished is exceeded.
+    A released result is written to disk and dropped from memory; later sessions
+    (a refreshed tab, a shared ?job= link) load it back with load_result().
+    """
+
+    def __init__(self, max_workers=2, max_finished=20, on_update=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prediction-job')
+        self._jobs = {}
+        self._lock = threading.RLock()
+        self.max_finished = max_finished
+        self.on_update = on_update
+
+    def submit(self, file_bytes, filename, submitted_by=None):
+        job = PredictionJob(file_bytes, filename, submitted_by)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._notify(job)
+        self._executor.submit(self._run, job)
+        logger.info(f"Queued prediction job {job.id} for {filename}")
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                return
+            job.cancel()
+            queued = job.status == QUEUED
+        # A queued job never starts once its cancel event is set; finish it outside the
+        # lock, since recording its state is a database round trip
+        if queued:
+            self._finish(job, CANCELLED)
+
+    def load_result(self, job_id):
+        """A completed job's result, read back from disk if it was released; None if it is gone"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != COMPLETED:
+                return None
+            if job.result is None and job.result_path is not None:
+                try:
+                    job.result = pd.read_parquet(job.result_path)
+                    logger.info(f"Reloaded result of prediction job {job_id}")
+                except OSError as e:
+                    logger.warning(f"Could not reload result of prediction job {job_id}: {str(e)}")
+            return job.result
+
+    def release_result(self, job_id):
+        """
+        Write a completed job's result to disk and drop the queue's reference, e.g. once a
+        session using it has spilled its copy. Sessions still holding the frame keep it alive;
+        the next load_result() reads it back.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.result is None:
+                return
+            result, path = job.result, job.result_path
+        if path is None:
+            # Written outside the lock so other sessions' get() doesn't wait on the disk
+            os.makedirs(JOB_SPILL_DIR, exist_ok=True)
+            path = os.path.join(JOB_SPILL_DIR, f"{job_id}.parquet")
+            write_parquet(result, f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+        with self._lock:
+            job.result_path = path
+            if job.result is result:
+                job.result = None
+                job.preview = None
+        logger.info(f"Released result of prediction job {job_id} to {path}")
+
+    def _notify(self, job):
+        if self.on_update is not None:
+            try:
+                self.on_update(job)
+            except Exception as e:
+                logger.warning(f"Could not record state of job {job.id}: {str(e)}")
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = datetime.now()
+        job._file_bytes = None
+        self._notify(job)
+        self._evict_finished()
+
+    def _evict_finished(self):
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.status in FINISHED_STATES),
+                key=lambda job: job.finished_at
+            )
+            for job in finished[:max(len(finished) - self.max_finished, 0)]:
+                del self._jobs[job.id]
+                if job.result_path is not None:
+                    try:
+                        os.remove(job.result_path)
+                    except OSError:
+                        pass
+
+    def _run(self, job):
+        with self._lock:
+            if job._cancel_event.is_set():
+                return
+            job.status = RUNNING
+            file = io.BytesIO(job._file_bytes)
+        self._notify(job)
+        try:
+            job.total_rows = estimate_row_count(file, job.filename)
+            raw_chunks = _with_original_preview(job, iter_file_chunks(file, job.filename, columns=UPLOAD_COLUMNS))
+            chunks = []
+            for processed_chunk in iter_process_chunks(raw_chunks):
+                if job._cancel_event.is_set():
+                    raise CancelledError()
+                if job.preview is None:
+                    job.preview = processed_chunk
+                chunks.append(processed_chunk)
+                job.rows_done += len(processed_chunk)
+                self._notify(job)
+            if job.original_preview is None:
+                job.original_preview = pd.DataFrame()
+            job.result = compact_frame(pd.concat(chunks, ignore_index=True)) if chunks else pd.DataFrame()
+            job.search_index = SearchIndex(job.result)
+            self._finish(job, COMPLETED)
+            logger.info(f"Prediction job {job.id} completed ({job.rows_done} rows)")
+        except CancelledError:
+            self._finish(job, CANCELLED)
+            logger.info(f"Prediction job {job.id} cancelled")
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, FAILED)
+            logger.error(f"Prediction job {job.id} failed: {str(e)}", exc_info=True)
+
+def get_job_queue():
+    """Return the process-wide job queue shared by every session"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                max_workers=int(os.getenv('PREDICTION_WORKERS', '2')),
+                on_update=record_job_state
+            )
+        return _job_queue
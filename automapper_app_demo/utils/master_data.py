@@ -0,0 +1,190 @@
+import pandas as pd
+import numpy as np
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+MASTER_DATA_PATH = os.path.join("data_db", "your_data.csv")
+
+# Process-wide cache of parsed master files: path -> ((mtime, size), MasterData)
+_master_cache = {}
+_master_lock = threading.Lock()
+
+# Output field -> master file column
+MAPPING_COLUMNS = {
+    'Placement Group': 'PLACEMENT_GROUP',
+    'Publisher': 'PUBLISHER',
+    'Tactic': 'TACTIC',
+    'Audience': 'AUDIENCE',
+    'Ad Type': 'AD_TYPE'
+}
+
+# Master file column names seen for the lookup keys, in order of preference
+CAMPAIGN_COLUMNS = ['CAMPAIGN', 'CAMPAIGN_NAME']
+PLACEMENT_COLUMNS = ['PLACEMENT_NAME', 'PLACEMENT_NAME_AD_SET_NAME']
+MEDIA_ID_COLUMN = 'PLACEMENT_ID_AD_SET_ID'
+MEDIA_NAME_COLUMN = 'PLACEMENT_NAME_AD_SET_NAME'
+
+# Only these columns are kept in memory
+_USED_COLUMNS = set(MAPPING_COLUMNS.values()) | set(CAMPAIGN_COLUMNS) | set(PLACEMENT_COLUMNS) | {MEDIA_ID_COLUMN}
+
+def normalize_key(value):
+    """Lowercase, drop the ':D' tail and collapse whitespace so near-identical names match"""
+    if not isinstance(value, str):
+        return ''
+    return ' '.join(value.split(":D")[0].lower().split())
+
+def normalize_keys(values):
+    """normalize_key over a whole Series, using Arrow string kernels instead of a per-value call"""
+    if values.dtype != object and not isinstance(values.dtype, (pd.StringDtype, pd.CategoricalDtype)):
+        return pd.Series('', index=values.index, dtype='string[pyarrow]')
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Normalize each distinct label once and expand through the codes; code -1 (missing) maps to ''
+        labels = normalize_keys(pd.Series(values.cat.categories, dtype=object)).to_numpy(dtype=object)
+        normalized = np.append(labels, '')[values.cat.codes.to_numpy()]
+        return pd.Series(normalized, index=values.index, dtype='string[pyarrow]')
+    # .str yields NaN for non-string values, which normalize to ''
+    text = values.where(values.str.len().notna(), '').astype('string[pyarrow]')
+    return (
+        text.str.replace(r'(?s):D.*', '', regex=True)
+        .str.lower()
+        .str.replace(r'\s+', ' ', regex=True)
+        .str.strip()
+    )
+
+def _labels(values):
+    """Stripped text of a master column, '' where missing; works on categorical columns"""
+    return values.astype(object).fillna('').astype(str).str.strip()
+
+def _first_column(df, candidates):
+    return next((col for col in candidates if col in df.columns), None)
+
+def load_master_data(path=MASTER_DATA_PATH):
+    """Read the used columns of the master mediaplan file, or return None if it isn't there"""
+    if not os.path.exists(path):
+        logger.warning(f"{path} not found; master data lookups are disabled.")
+        return None
+    return pd.read_csv(path, usecols=lambda col: col in _USED_COLUMNS)
+
+def build_mapping_index(master_df):
+    """
+    Returns {(campaign, placement name): {output field: value}} for every normalized
+    key in the master file that maps to exactly one set of values. Ambiguous keys are
+    left out so they fall through to the model.
+    """
+    if master_df is None:
+        return {}
+    campaign_col = _first_column(master_df, CAMPAIGN_COLUMNS)
+    placement_col = _first_column(master_df, PLACEMENT_COLUMNS)
+    missing = [col for col in MAPPING_COLUMNS.values() if col not in master_df.columns]
+    if campaign_col is None or placement_col is None or missing:
+        logger.warning("Master file lacks campaign/placement/mapping columns; lookup index is empty.")
+        return {}
+
+    index_df = pd.DataFrame({
+        'campaign': normalize_keys(master_df[campaign_col]),
+        'placement': normalize_keys(master_df[placement_col])
+    })
+    for field, col in MAPPING_COLUMNS.items():
+        index_df[field] = _labels(master_df[col])
+
+    index_df = index_df[(index_df['campaign'] != '') & (index_df['placement'] != '')].drop_duplicates()
+    index_df = index_df[~index_df.duplicated(['campaign', 'placement'], keep=False)]
+
+    keys = zip(index_df['campaign'], index_df['placement'])
+    index = dict(zip(keys, index_df[list(MAPPING_COLUMNS)].to_dict('records')))
+    logger.info(f"Built master lookup index with {len(index)} placements")
+    return index
+
+def build_group_index(master_df):
+    """
+    Returns a DataFrame indexed by Placement Group with the Tactic, Audience and
+    Ad Type of the first master row for each group.
+    """
+    columns = ['Tactic', 'Audience', 'Ad Type']
+    if master_df is None or 'PLACEMENT_GROUP' not in master_df.columns:
+        return pd.DataFrame(columns=columns)
+    group_df = pd.DataFrame({
+        field: _labels(master_df[MAPPING_COLUMNS[field]])
+        if MAPPING_COLUMNS[field] in master_df.columns else ''
+        for field in ['Placement Group'] + columns
+    })
+    group_df = group_df[group_df['Placement Group'] != '']
+    return group_df.drop_duplicates('Placement Group').set_index('Placement Group')
+
+def build_media_id_index(master_df):
+    """Returns {Media ID: placement name} for filling in missing placement names"""
+    if master_df is None or MEDIA_ID_COLUMN not in master_df.columns or MEDIA_NAME_COLUMN not in master_df.columns:
+        return {}
+    return dict(zip(master_df[MEDIA_ID_COLUMN].astype(str), master_df[MEDIA_NAME_COLUMN].astype(object)))
+
+def _compact(df):
+    """Store repeated strings as categoricals; the master file is mostly low-cardinality labels"""
+    for col in df.columns:
+        if df[col].dtype == object or isinstance(df[col].dtype, pd.StringDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+def validation_status(df, group_index):
+    """
+    Returns a boolean DataFrame aligned with df for the Placement Group, Tactic,
+    Audience and Ad Type columns present in df. Placement Group is True when the
+    group exists in the master file; the other cells are True when they match the
+    master values for that group.
+    """
+    columns = [col for col in ['Placement Group', 'Tactic', 'Audience', 'Ad Type'] if col in df.columns]
+    status = pd.DataFrame(False, index=df.index, columns=columns)
+    if 'Placement Group' not in df.columns:
+        return status
+
+    groups = df['Placement Group'].astype(str).str.strip()
+    found = groups.isin(group_index.index).to_numpy()
+    reference = group_index.reindex(groups.to_numpy())
+    status['Placement Group'] = found
+    for col in columns[1:]:
+        values = df[col].astype(str).str.strip().to_numpy()
+        status[col] = found & (values == reference[col].to_numpy())
+    return status
+
+class MasterData:
+    """Parsed master mediaplan file and every index built from it"""
+
+    def __init__(self, master_df):
+        # Every index is built from the compacted frame, which is also kept for other consumers
+        self.df = _compact(master_df) if master_df is not None else None
+        self.mapping_index = build_mapping_index(self.df)
+        # Hashed keys and a parallel value array for vectorized lookups; position -1 hits the trailing None
+        self.mapping_keys = pd.MultiIndex.from_tuples(list(self.mapping_index), names=['campaign', 'placement']) if self.mapping_index else None
+        self.mapping_values = np.empty(len(self.mapping_index) + 1, dtype=object)
+        self.mapping_values[:-1] = list(self.mapping_index.values())
+        self.group_index = build_group_index(self.df)
+        self.media_id_map = build_media_id_index(self.df)
+
+    def lookup(self, campaign_keys, placement_keys):
+        """Object array of the mapped fields dict for each (campaign, placement) key pair, None where unmapped"""
+        if self.mapping_keys is None:
+            return np.full(len(campaign_keys), None, dtype=object)
+        keys = pd.MultiIndex.from_arrays([np.asarray(campaign_keys, dtype=object), np.asarray(placement_keys, dtype=object)])
+        positions = self.mapping_keys.get_indexer(keys)
+        return self.mapping_values[positions]
+
+def get_master_data(path=MASTER_DATA_PATH):
+    """
+    Returns the shared MasterData for path, parsed once per process and rebuilt only
+    when the file's mtime or size changes. Returns None if the file doesn't exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        logger.warning(f"{path} not found; master data lookups are disabled.")
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with _master_lock:
+        entry = _master_cache.get(path)
+        if entry is None or entry[0] != signature:
+            logger.info(f"Loading master data from {path}")
+            _master_cache[path] = (signature, MasterData(load_master_data(path)))
+        return _master_cache[path][1]
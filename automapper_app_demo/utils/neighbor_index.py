@@ -0,0 +1,207 @@
+"""Fuzzy nearest-neighbour retrieval over the placements mapped in the master file.
+
+Build the index offline (from automapper_app_demo/):
+    python -m utils.neighbor_index
+
+Placement names are normalized like the exact lookup keys and embedded as TF-IDF
+vectors of character 3-5 grams, so near-variants that differ in dates, sizes or
+suffixes still have a cosine similarity close to 1. Like the exact lookup, entries
+are keyed by (campaign, placement): a placement only takes mappings from its own
+campaign. The app loads the saved index while it matches the master file's
+contents, and builds it itself otherwise.
+"""
+import argparse
+import os
+import pickle
+import hashlib
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from utils.master_data import (
+    MASTER_DATA_PATH, MAPPING_COLUMNS, CAMPAIGN_COLUMNS, PLACEMENT_COLUMNS,
+    get_master_data, normalize_keys, _first_column, _labels
+)
+
+try:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+except ImportError:
+    TfidfVectorizer = None
+
+logger = logging.getLogger(__name__)
+
+NEIGHBOR_INDEX_PATH = os.getenv('NEIGHBOR_INDEX_PATH', './cache/neighbor_index.pkl')
+# Rows whose best neighbour is at least this similar take its mapping instead of being generated; above 1 disables
+NEIGHBOR_SKIP_SIMILARITY = float(os.getenv('NEIGHBOR_SKIP_SIMILARITY', '0.9'))
+
+# Queries per sparse product; bounds the similarity block held in memory
+_QUERY_BLOCK = 1024
+# Bumped when the pickled index layout changes, so older saved indexes are rebuilt
+_INDEX_FORMAT = 2
+
+# Process-wide cache: master path -> ((mtime, size), NeighborIndex)
+_index_cache = {}
+_index_lock = threading.Lock()
+
+class NeighborIndex:
+    """Character n-gram TF-IDF index of the master file's distinct (campaign, placement, mapping) entries"""
+
+    def __init__(self, master_df):
+        placement_col = _first_column(master_df, PLACEMENT_COLUMNS)
+        campaign_col = _first_column(master_df, CAMPAIGN_COLUMNS)
+        missing = [col for col in MAPPING_COLUMNS.values() if col not in master_df.columns]
+        if campaign_col is None or placement_col is None or missing:
+            raise ValueError(f"Master file lacks campaign/placement/mapping columns for the neighbour index: {missing}")
+
+        entries = pd.DataFrame({
+            'Placement Name': master_df[placement_col].astype(object),
+            'Campaign': master_df[campaign_col].astype(object),
+            **{field: _labels(master_df[col]) for field, col in MAPPING_COLUMNS.items()}
+        })
+        entries['campaign_key'] = normalize_keys(master_df[campaign_col]).to_numpy(dtype=object)
+        entries['key'] = normalize_keys(master_df[placement_col]).to_numpy(dtype=object)
+        entries = entries[(entries['campaign_key'] != '') & (entries['key'] != '')]
+        entries = entries.drop_duplicates(['campaign_key', 'key'] + list(MAPPING_COLUMNS)).reset_index(drop=True)
+
+        self.vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(3, 5), sublinear_tf=True, dtype=np.float32)
+        matrix = self.vectorizer.fit_transform(entries['key'])
+        # Rows are L2-normalized, so query @ matrix.T is cosine similarity
+        self._matrix_t = matrix.T.tocsr()
+        # Each entry's campaign as a code into self._campaigns; candidates must share the query's code
+        self._entry_campaigns, self._campaigns = pd.factorize(entries['campaign_key'])
+        self.entries = entries.drop(columns=['campaign_key', 'key'])
+        self._records = np.empty(len(entries), dtype=object)
+        self._records[:] = self.entries[list(MAPPING_COLUMNS)].to_dict('records')
+        # Entries with identical mappings share a code, to spot ties between different mappings
+        self._mapping_codes = self.entries.groupby(list(MAPPING_COLUMNS), sort=False).ngroup().to_numpy()
+        logger.info(f"Built neighbour index over {len(entries)} placements, {matrix.shape[1]} n-grams")
+
+    def query(self, campaigns, placement_names, k=5):
+        """
+        Returns (positions, similarities), both shaped (n, k) and best first. Positions
+        index self.entries and are -1 where fewer than k entries of the same campaign
+        share any n-gram.
+        """
+        keys = normalize_keys(pd.Series(placement_names, dtype=object))
+        # Campaigns missing from the master file get code -1, which no entry has
+        campaign_codes = self._campaigns.get_indexer(normalize_keys(pd.Series(campaigns, dtype=object)))
+        queries = self.vectorizer.transform(keys)
+        positions = np.full((len(keys), k), -1, dtype=np.int64)
+        similarities = np.zeros((len(keys), k), dtype=np.float32)
+        for start in range(0, len(keys), _QUERY_BLOCK):
+            block = (queries[start:start + _QUERY_BLOCK] @ self._matrix_t).tocsr()
+            for row in range(block.shape[0]):
+                lo, hi = block.indptr[row], block.indptr[row + 1]
+                scores, columns = block.data[lo:hi], block.indices[lo:hi]
+                same_campaign = self._entry_campaigns[columns] == campaign_codes[start + row]
+                scores, columns = scores[same_campaign], columns[same_campaign]
+                top = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+                top = top[np.argsort(-scores[top], kind='stable')]
+                positions[start + row, :len(top)] = columns[top]
+                similarities[start + row, :len(top)] = scores[top]
+        return positions, similarities
+
+    def best_matches(self, campaigns, placement_names, min_similarity):
+        """
+        Object array of {field: value} from each name's nearest entry in its campaign where it
+        is at least min_similarity similar and not tied with a differently mapped entry; None
+        elsewhere. Also returns the nearest similarity for every name.
+        """
+        positions, similarities = self.query(campaigns, placement_names, k=2)
+        best, runner_up = positions[:, 0], positions[:, 1]
+        tied = (runner_up >= 0) & (similarities[:, 1] >= similarities[:, 0] - 1e-6) & (
+            self._mapping_codes[best] != self._mapping_codes[np.maximum(runner_up, 0)]
+        )
+        close = (best >= 0) & (similarities[:, 0] >= min_similarity) & ~tied
+        matches = np.full(len(best), None, dtype=object)
+        matches[close] = self._records[best[close]]
+        return matches, similarities[:, 0]
+
+    def neighbours(self, campaign, placement_name, k=5):
+        """The k most similar historical placements of the campaign with their mappings, for reviewers"""
+        positions, similarities = self.query([campaign], [placement_name], k=k)
+        found = positions[0] >= 0
+        result = self.entries.iloc[positions[0][found]].reset_index(drop=True)
+        result.insert(0, 'Similarity', similarities[0][found].round(3))
+        return result
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def build_neighbor_index(master_path=MASTER_DATA_PATH, index_path=NEIGHBOR_INDEX_PATH):
+    """Build the index from the shared master data and save it with the file's content hash"""
+    master_data = get_master_data(master_path)
+    if master_data is None:
+        raise ValueError(f"{master_path} not found")
+    index = NeighborIndex(master_data.df)
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    with open(index_path, 'wb') as f:
+        pickle.dump({'format': _INDEX_FORMAT, 'master_digest': _file_digest(master_path), 'index': index}, f)
+    logger.info(f"Saved neighbour index to {index_path}")
+    return index
+
+def _load_saved_index(master_path, index_path):
+    """The saved index if it was built from the current master file contents, else None"""
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with open(index_path, 'rb') as f:
+            saved = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read neighbour index {index_path}: {str(e)}")
+        return None
+    if saved.get('format') != _INDEX_FORMAT:
+        logger.info(f"Neighbour index {index_path} has an older layout")
+        return None
+    if saved.get('master_digest') != _file_digest(master_path):
+        logger.info(f"Neighbour index {index_path} was built from another version of {master_path}")
+        return None
+    return saved['index']
+
+def get_neighbor_index(master_path=MASTER_DATA_PATH, index_path=NEIGHBOR_INDEX_PATH):
+    """
+    Returns the shared NeighborIndex for the master file, loaded once per process and
+    again only when the file's mtime or size changes. Returns None when the master file
+    or scikit-learn is missing.
+    """
+    if TfidfVectorizer is None:
+        return None
+    try:
+        stat = os.stat(master_path)
+    except FileNotFoundError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with _index_lock:
+        entry = _index_cache.get(master_path)
+        if entry is None or entry[0] != signature:
+            index = _load_saved_index(master_path, index_path)
+            if index is None:
+                try:
+                    index = build_neighbor_index(master_path, index_path)
+                except ValueError as e:
+                    logger.warning(f"Neighbour retrieval disabled: {str(e)}")
+            _index_cache[master_path] = (signature, index)
+        return _index_cache[master_path][1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--master-path', default=MASTER_DATA_PATH)
+    parser.add_argument('--index-path', default=NEIGHBOR_INDEX_PATH)
+    args = parser.parse_args()
+
+    if TfidfVectorizer is None:
+        raise SystemExit("scikit-learn is required to build the neighbour index")
+    # Imported by module name so the pickled index loads in the app, not only under __main__
+    from utils.neighbor_index import build_neighbor_index as build
+
+    logging.basicConfig(level=logging.INFO)
+    index = build(args.master_path, args.index_path)
+    print(f"Neighbour index over {len(index.entries)} placements written to {args.index_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""ONNX Runtime backend for the T5 mapper model.
+
+Export the fine-tuned model once (from automapper_app_demo/):
+    python -m utils.onnx_backend --model-dir ./model_outputs
+
+then run the app with MODEL_BACKEND=onnx. The export keeps separate decoder
+graphs with and without past key/values, so generation reuses cached
+attention states instead of re-running the decoder over the whole prefix.
+"""
+import argparse
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Written next to the exported graphs; records which model_outputs hash they came from
+SOURCE_VERSION_FILE = 'source_model_version.txt'
+
+def default_onnx_dir(model_path):
+    return os.getenv('ONNX_MODEL_DIR', os.path.join(model_path, 'onnx'))
+
+def export_onnx(model_path, output_dir, source_version):
+    """Export model_path to ONNX encoder/decoder graphs with past key/value caching"""
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import T5Tokenizer
+
+    logger.info(f"Exporting {model_path} to ONNX in {output_dir}")
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_path, export=True, use_cache=True)
+    model.save_pretrained(output_dir)
+    T5Tokenizer.from_pretrained(model_path).save_pretrained(output_dir)
+    with open(os.path.join(output_dir, SOURCE_VERSION_FILE), 'w') as f:
+        f.write(source_version)
+
+def load_onnx_model(onnx_dir, source_version):
+    """Load exported graphs; raises if missing, stale, or onnxruntime/optimum isn't installed"""
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    version_path = os.path.join(onnx_dir, SOURCE_VERSION_FILE)
+    if not os.path.exists(version_path):
+        raise FileNotFoundError(f"No ONNX export found in {onnx_dir}")
+    with open(version_path) as f:
+        if f.read().strip() != source_version:
+            raise ValueError(f"ONNX export in {onnx_dir} is stale, re-run the export")
+
+    return ORTModelForSeq2SeqLM.from_pretrained(onnx_dir, use_cache=True)
+
+def main():
+    from utils.file_processor import _model_version
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', default=os.getenv('MODEL_DIR', './model_outputs'))
+    parser.add_argument('--output-dir', default=None, help="Defaults to ONNX_MODEL_DIR or <model-dir>/onnx")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    output_dir = args.output_dir or default_onnx_dir(args.model_dir)
+    export_onnx(args.model_dir, output_dir, _model_version(args.model_dir))
+    print(f"ONNX model written to {output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import sqlite3
+import json
+import os
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# SQLite's default limit on bound parameters is 999
+_SQL_CHUNK_SIZE = 500
+
+class PredictionCache:
+    """Persistent prompt -> prediction cache stored in a local SQLite file.
+
+    Entries are keyed by (model_version, prompt). Several versions (precisions,
+    backends, decoding modes, the batch runner and the app) may share one file,
+    so entries of other versions are never deleted outright; rows of retrained
+    or unused versions simply stop being read and are evicted as the least
+    recently used once max_entries is exceeded.
+    """
+
+    def __init__(self, path, max_entries=500000):
+        self.path = path
+        self.max_entries = max_entries
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS predictions (
+                    model_version TEXT NOT NULL,
+                    prompt TEXT NOT NULL,
+                    prediction TEXT NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model_version, prompt)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_last_used ON predictions(last_used)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, model_version, prompts):
+        """Return a {prompt: prediction} dict for every prompt found in the cache"""
+        found = {}
+        prompts = list(prompts)
+        now = time.time()
+        with self._connect() as conn:
+            for i in range(0, len(prompts), _SQL_CHUNK_SIZE):
+                chunk = prompts[i:i + _SQL_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f"SELECT prompt, prediction FROM predictions "
+                    f"WHERE model_version = ? AND prompt IN ({placeholders})",
+                    [model_version, *chunk]
+                ).fetchall()
+                for prompt, prediction in rows:
+                    found[prompt] = json.loads(prediction)
+                if rows:
+                    conn.execute(
+                        f"UPDATE predictions SET last_used = ? "
+                        f"WHERE model_version = ? AND prompt IN ({','.join('?' * len(rows))})",
+                        [now, model_version, *[prompt for prompt, _ in rows]]
+                    )
+        return found
+
+    def put_many(self, model_version, predictions):
+        """Store a {prompt: prediction} dict and evict the least recently used overflow"""
+        if not predictions:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO predictions (model_version, prompt, prediction, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                [(model_version, prompt, json.dumps(prediction), now)
+                 for prompt, prediction in predictions.items()]
+            )
+            overflow = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM predictions WHERE rowid IN "
+                    "(SELECT rowid FROM predictions ORDER BY last_used LIMIT ?)",
+                    (overflow,)
+                )
+                logger.info(f"Prediction cache: evicted {overflow} least recently used entries")
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM predictions")
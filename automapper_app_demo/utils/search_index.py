@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Columns the editor can search, original and predicted
+SEARCH_COLUMNS = ['Placement Name', 'Campaign', 'Publisher', 'Placement Group', 'Tactic', 'Audience', 'Ad Type']
+
+GRAM_SIZE = 3
+
+def _grams(value):
+    return {value[i:i + GRAM_SIZE] for i in range(len(value) - GRAM_SIZE + 1)}
+
+def _normalize(value):
+    # Missing cells match nothing, like str.contains(..., na=False), rather than the text 'nan'/'none'
+    if value is None or (np.isscalar(value) and pd.isna(value)):
+        return ''
+    return str(value).lower()
+
+class SearchIndex:
+    """
+    Case-insensitive substring index over a DataFrame's text columns.
+
+    Media plans repeat the same strings heavily, so each column is indexed by its
+    distinct lowercased values: value -> row positions, plus trigram -> values
+    postings. A query intersects the postings of its trigrams, verifies the few
+    candidate values with a substring check, and returns their rows. Queries
+    shorter than a trigram scan the distinct values instead of the rows.
+    Missing cells are not indexed, so they never match.
+    """
+
+    def __init__(self, df, columns=SEARCH_COLUMNS):
+        self.columns = [col for col in columns if col in df.columns]
+        self._value_rows = {}
+        self._postings = {}
+        for col in self.columns:
+            present = np.flatnonzero(df[col].notna().to_numpy())
+            lowered = df[col].iloc[present].astype(str).str.lower()
+            self._value_rows[col] = {
+                value: set(present[rows].tolist()) for value, rows in lowered.groupby(lowered, sort=False).indices.items()
+            }
+            postings = defaultdict(set)
+            for value in self._value_rows[col]:
+                for gram in _grams(value):
+                    postings[gram].add(value)
+            self._postings[col] = postings
+        logger.info(f"Built search index over {len(df)} rows, columns {self.columns}")
+
+    def _matching_values(self, col, term):
+        values = self._value_rows[col]
+        if len(term) < GRAM_SIZE:
+            return [value for value in values if term in value]
+        postings = self._postings[col]
+        grams = sorted(_grams(term), key=lambda gram: len(postings.get(gram, ())))
+        candidates = set(postings.get(grams[0], ()))
+        for gram in grams[1:]:
+            candidates &= postings.get(gram, set())
+            if not candidates:
+                break
+        return [value for value in candidates if term in value]
+
+    def search(self, term, columns=None):
+        """Sorted row positions whose value in any of columns contains term"""
+        term = _normalize(term)
+        rows = set()
+        for col in columns or self.columns:
+            if col in self._value_rows:
+                for value in self._matching_values(col, term):
+                    rows |= self._value_rows[col][value]
+        return np.array(sorted(rows), dtype=np.int64)
+
+    def overlay(self):
+        """A per-session view of this index that records edits without modifying the shared index"""
+        return SearchOverlay(self)
+
+class SearchOverlay:
+    """
+    Edits made in one session on top of a shared, read-only SearchIndex.
+
+    Only the edited and added cells are stored, as {column: {row: lowercased value}};
+    those rows' base values are ignored for that column. Sessions make few edits
+    relative to the rows in the file, so the overlay is scanned directly.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.columns = base.columns
+        self._cells = {col: {} for col in base.columns}
+
+    def search(self, term, columns=None):
+        """Sorted row positions whose current value in any of columns contains term"""
+        needle = _normalize(term)
+        matches = []
+        for col in columns or self.columns:
+            if col not in self._cells:
+                continue
+            rows = self.base.search(term, [col])
+            overridden = self._cells[col]
+            if overridden:
+                rows = rows[~np.isin(rows, np.fromiter(overridden, dtype=np.int64, count=len(overridden)))]
+                edited = [row for row, value in overridden.items() if needle in value]
+                rows = np.concatenate([rows, np.array(edited, dtype=np.int64)])
+            matches.append(rows)
+        if not matches:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate(matches))
+
+    def update(self, row, col, old_value, new_value):
+        """Record that one cell now holds new_value"""
+        if col in self._cells:
+            self._cells[col][row] = _normalize(new_value)
+
+    def add_row(self, row, values):
+        """Index a row appended at position row; values maps column -> value"""
+        for col in self.columns:
+            self._cells[col][row] = _normalize(values.get(col, float('nan')))
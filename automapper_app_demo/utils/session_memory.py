@@ -0,0 +1,156 @@
+import pandas as pd
+import os
+import uuid
+import shutil
+import logging
+import weakref
+from collections import OrderedDict
+from utils.export_utils import write_parquet
+
+logger = logging.getLogger(__name__)
+
+SESSION_MEMORY_BUDGET_MB = float(os.getenv('SESSION_MEMORY_BUDGET_MB', '256'))
+SESSION_SPILL_DIR = os.getenv('SESSION_SPILL_DIR', './cache/sessions')
+
+# Columns with at most this share of distinct values are stored as categoricals
+CATEGORY_MAX_RATIO = 0.5
+
+def enable_copy_on_write():
+    """Let derived frames share column buffers with their source until one of them is modified"""
+    pd.set_option('mode.copy_on_write', True)
+
+def compact_frame(df):
+    """
+    Store text columns compactly: low-cardinality columns (the predicted fields,
+    campaigns) as categoricals, other all-string columns as Arrow strings. Mixed
+    or non-string object columns are left alone.
+    """
+    df = df.copy(deep=False)
+    for col in df.columns:
+        series = df[col]
+        if series.dtype != object or pd.api.types.infer_dtype(series, skipna=True) != 'string':
+            continue
+        if series.nunique(dropna=True) <= CATEGORY_MAX_RATIO * len(series):
+            df[col] = series.astype('category')
+        else:
+            df[col] = series.astype('string[pyarrow]')
+    return df
+
+def frame_nbytes(df):
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+class SessionFrames:
+    """
+    Named DataFrame versions kept for one session (the processed result, the
+    confirmed edit, ...) under a memory budget. When the frames held in memory
+    exceed the budget, the least recently used ones are spilled to Parquet in a
+    per-session directory and read back on access. A frame held under several
+    names is counted once and never spilled, since that would free nothing; a
+    frame also held outside the session is stored with a release callback that
+    drops that other reference when the frame is spilled. The spill directory is
+    removed when the session's SessionFrames is garbage collected or the process exits.
+    """
+
+    def __init__(self, budget_mb=SESSION_MEMORY_BUDGET_MB, spill_dir=SESSION_SPILL_DIR):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.spill_dir = os.path.join(spill_dir, str(uuid.uuid4()))
+        self._frames = OrderedDict()  # name -> (DataFrame, bytes), least recently used first
+        self._spilled = {}  # name -> parquet path
+        self._release = {}  # name -> callable dropping references held outside the session
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.spill_dir, ignore_errors=True)
+        self._extra_sizes = {}  # id -> (DataFrame, bytes) of the extra frames last passed to footprint()
+
+    def __contains__(self, name):
+        return name in self._frames or name in self._spilled
+
+    def put(self, name, df, release=None):
+        """
+        Store df under name. release, if given, is called when df is spilled so that
+        whatever else holds df (a job result, an edit log's cache) lets go of it too.
+        """
+        self.pop(name)
+        if df is not None:
+            self._frames[name] = (df, self._nbytes(df))
+            if release is not None:
+                self._release[name] = release
+            self._enforce_budget(keep=name)
+
+    def get(self, name, default=None):
+        if name in self._spilled:
+            path = self._spilled.pop(name)
+            df = pd.read_parquet(path)
+            self._frames[name] = (df, frame_nbytes(df))
+            self._remove_file(path)
+            logger.info(f"Reloaded spilled session frame {name}")
+        if name not in self._frames:
+            return default
+        self._frames.move_to_end(name)
+        self._enforce_budget(keep=name)
+        return self._frames[name][0]
+
+    def pop(self, name):
+        self._frames.pop(name, None)
+        self._release.pop(name, None)
+        if name in self._spilled:
+            self._remove_file(self._spilled.pop(name))
+
+    def _nbytes(self, df):
+        # Sizing object columns is O(rows); reuse the size of a frame already held under another name
+        for other, nbytes in self._frames.values():
+            if other is df:
+                return nbytes
+        return frame_nbytes(df)
+
+    def footprint(self, extra=()):
+        """
+        Bytes held in memory by this session's frames plus extra frames, shared frames
+        counted once. Extra frames are sized once and reused while the same object is
+        passed again, so reruns on an unchanged version don't rescan every row.
+        """
+        sizes = {id(df): nbytes for df, nbytes in self._frames.values()}
+        extra_sizes = {}
+        for df in extra:
+            if df is None or id(df) in sizes:
+                continue
+            cached = self._extra_sizes.get(id(df))
+            nbytes = cached[1] if cached is not None and cached[0] is df else frame_nbytes(df)
+            extra_sizes[id(df)] = (df, nbytes)
+            sizes[id(df)] = nbytes
+        self._extra_sizes = extra_sizes
+        return sum(sizes.values())
+
+    def spilled_bytes(self):
+        return sum(os.path.getsize(path) for path in self._spilled.values() if os.path.exists(path))
+
+    def _enforce_budget(self, keep):
+        footprint = self.footprint()
+        for name in list(self._frames):
+            if footprint <= self.budget_bytes:
+                break
+            df, nbytes = self._frames[name]
+            if name == keep or sum(other is df for other, _ in self._frames.values()) > 1:
+                continue  # in use, or held under another name so spilling would free nothing
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"{name}.parquet")
+            # Edited and inferred object columns can mix types, which Arrow rejects; this writes them as strings
+            write_parquet(df, path)
+            del self._frames[name]
+            release = self._release.pop(name, None)
+            if release is not None:
+                release()
+            self._spilled[name] = path
+            footprint -= nbytes
+            logger.info(f"Spilled session frame {name} ({nbytes / 1e6:.1f} MB) to {path}")
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        self._frames.clear()
+        self._spilled.clear()
+        self._release.clear()
+        self._extra_sizes = {}
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
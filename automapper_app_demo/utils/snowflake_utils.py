@@ -6,13 +6,16 @@ import streamlit as st
 import uuid
 from datetime import datetime
 from openpyxl import load_workbook
-import io
 import os
 import tempfile
+import shutil
+from contextlib import nullcontext
+from utils.upload_reader import read_xlsx
+from utils.export_utils import export_bytes, write_parquet
+from utils.db_pool import connect, qualified, pooled_connection, unit_of_work
 
-# Mock data storage
+# Mock data storage; staged files live in the stage (a local directory when DB_BACKEND is 'local')
 mock_db = {
-    'files': {},
     'comments': [],
     'users': {
         'mapper': {'username': 'mapper', 'account_type': 'Mapper'},
@@ -24,18 +27,61 @@ mock_db = {
 }
 
 def get_snowflake_connection():
-    """Mock connection function"""
-    return None
+    """Open a standalone connection; helpers here use the shared pool instead"""
+    return connect()
 
-def stage_file(df, filename, stage_name):
-    """Mock staging a file"""
-    file_id = f"{stage_name}/{filename}"
-    mock_db['files'][file_id] = df
-    return file_id
+def _split_stage_path(stage_path):
+    stage_name, _, filename = stage_path.lstrip('@').partition('/')
+    return stage_name, filename
+
+def _local_stage_file(stage_name, filename):
+    return os.path.join(Config.LOCAL_STAGE_DIR, stage_name, filename)
+
+def stage_file(df, filename, stage_name, conn=None):
+    """
+    Stage a DataFrame as a zstd Parquet file and return its stage path (@STAGE/filename).
+    Pass conn when already holding a pooled connection, so the PUT doesn't wait on a second one.
+    """
+    if Config.DB_BACKEND != 'snowflake':
+        path = _local_stage_file(stage_name, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_parquet(df, path)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, filename)
+            write_parquet(df, path)
+            with nullcontext(conn) if conn is not None else pooled_connection() as conn:
+                # Already compressed; PUT must not gzip it again. Names are unique, so never overwrite
+                conn.cursor().execute(f"PUT 'file://{path}' @{stage_name} AUTO_COMPRESS = FALSE")
+    return f"@{stage_name}/{filename}"
 
 def read_from_stage(stage_path):
-    """Mock reading from stage"""
-    return mock_db['files'].get(stage_path, pd.DataFrame())
+    """Read a staged Parquet file back into a DataFrame"""
+    stage_name, filename = _split_stage_path(stage_path)
+    if Config.DB_BACKEND != 'snowflake':
+        path = _local_stage_file(stage_name, filename)
+        return pd.read_parquet(path) if os.path.exists(path) else pd.DataFrame()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with pooled_connection() as conn:
+            conn.cursor().execute(f"GET @{stage_name}/{filename} 'file://{tmp_dir}/'")
+        path = os.path.join(tmp_dir, filename)
+        return pd.read_parquet(path) if os.path.exists(path) else pd.DataFrame()
+
+def copy_staged_file(stage_path, stage_name, prefix):
+    """Copy a staged file under stage_name/prefix/ without downloading it; returns the new stage path"""
+    source_stage, source_filename = _split_stage_path(stage_path)
+    directory, _, name = source_filename.rpartition('/')
+    if Config.DB_BACKEND != 'snowflake':
+        path = _local_stage_file(stage_name, f"{prefix}/{name}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(_local_stage_file(source_stage, source_filename), path)
+    else:
+        with pooled_connection() as conn:
+            # Server-side bulk copy between stages
+            conn.cursor().execute(
+                f"COPY FILES INTO @{stage_name}/{prefix}/ FROM @{source_stage}/{directory} FILES = ('{name}')"
+            )
+    return f"@{stage_name}/{prefix}/{name}"
 
 def get_reference_data():
     """Mock reference data"""
@@ -51,25 +97,61 @@ def get_campaign_names():
     """Mock campaign names"""
     return ['Campaign 1', 'Campaign 2', 'Campaign 3']
 
+def _latest_stage_path(submission_id):
+    """Stage path of the submission's most recent file version, or None"""
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT STAGE_PATH
+            FROM {qualified(Config.TABLE_FILE_VERSIONS)}
+            WHERE SUBMISSION_ID = %s
+            ORDER BY VERSION_NUMBER DESC
+            LIMIT 1
+        """, (submission_id,))
+        latest_version = cur.fetchone()
+    return latest_version[0] if latest_version and latest_version[0] else None
+
 def get_file_data(submission_id):
-    """Mock getting file data"""
+    """The submission's latest staged file version, else the mock data"""
+    stage_path = _latest_stage_path(submission_id)
+    if stage_path:
+        return read_from_stage(stage_path)
     return mock_db['submissions'].get(submission_id, {}).get('data', None)
 
+def record_job_state(job):
+    """Record a prediction job's status on its file submission record; the data itself stays with the job"""
+    with unit_of_work() as work:
+        existing = work.fetchone(f"""
+            SELECT ID
+            FROM {Config.TABLE_FILE_SUBMISSIONS}
+            WHERE ID = %s
+        """, (job.id,))
+        if existing is None:
+            work.execute(f"""
+                INSERT INTO {Config.TABLE_FILE_SUBMISSIONS}
+                (ID, FILENAME, STATUS, SUBMITTED_BY, CREATED_AT, JOB_STATUS, JOB_PROGRESS, JOB_ERROR)
+                VALUES (%s, %s, 'uploaded', %s, CURRENT_TIMESTAMP, %s, %s, %s)
+            """, (job.id, job.filename, job.submitted_by, job.status, job.progress, job.error))
+        else:
+            work.execute(f"""
+                UPDATE {Config.TABLE_FILE_SUBMISSIONS}
+                SET JOB_STATUS = %s,
+                    JOB_PROGRESS = %s,
+                    JOB_ERROR = %s,
+                    UPDATED_AT = CURRENT_TIMESTAMP
+                WHERE ID = %s
+            """, (job.status, job.progress, job.error, job.id))
+
 def update_file_status(submission_id, status, reviewer=None):
     """Update file submission status with better tracking"""
-    conn = get_snowflake_connection()
-    try:
-        cur = conn.cursor()
-        
+    with unit_of_work() as work:
         # Get current status first
-        cur.execute(f"""
+        current_status = work.fetchone(f"""
             SELECT STATUS, CURRENT_REVIEWER
             FROM {Config.TABLE_FILE_SUBMISSIONS}
             WHERE ID = %s
         """, (submission_id,))
         
-        current_status = cur.fetchone()
-        
         # Validate status transition
         valid_transitions = {
             'uploaded': 'mapper_complete',
@@ -83,7 +165,7 @@ def update_file_status(submission_id, status, reviewer=None):
             
         # Update status and reviewer
         if reviewer:
-            cur.execute(f"""
+            work.execute(f"""
                 UPDATE {Config.TABLE_FILE_SUBMISSIONS}
                 SET STATUS = %s, 
                     CURRENT_REVIEWER = %s,
@@ -91,166 +173,141 @@ def update_file_status(submission_id, status, reviewer=None):
                 WHERE ID = %s
             """, (status, reviewer, submission_id))
         else:
-            cur.execute(f"""
+            work.execute(f"""
                 UPDATE {Config.TABLE_FILE_SUBMISSIONS}
                 SET STATUS = %s,
                     UPDATED_AT = CURRENT_TIMESTAMP
                 WHERE ID = %s
             """, (status, submission_id))
             
-        # Add status history record
+        # Add status history record; sent with the update in one transaction
         history_id = str(uuid.uuid4())
-        cur.execute(f"""
+        work.execute(f"""
             INSERT INTO {Config.TABLE_STATUS_HISTORY}
             (ID, SUBMISSION_ID, STATUS, CHANGED_BY, CHANGED_AT)
             VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
         """, (history_id, submission_id, status, reviewer or 'SYSTEM'))
-        
-        conn.commit()
-    finally:
-        conn.close()
 
 def submit_for_review(df, submission_id, account_type):
     """Submit file for review to next account type"""
-    conn = get_snowflake_connection()
     try:
-        cur = conn.cursor()
-        
-        # Use fully qualified names
-        table_file_versions = f"{Config.SNOWFLAKE_DATABASE}.{Config.SNOWFLAKE_SCHEMA}.{Config.TABLE_FILE_VERSIONS}"
-        
-        # Get current status and original submitter
-        cur.execute(f"""
-            SELECT STATUS, SUBMITTED_BY 
-            FROM {Config.TABLE_FILE_SUBMISSIONS} 
-            WHERE ID = %s
-        """, (submission_id,))
-        result = cur.fetchone()
-        current_status, original_submitter = result
+        with unit_of_work() as work:
+            # Use fully qualified names
+            table_file_versions = qualified(Config.TABLE_FILE_VERSIONS)
+            
+            # Get current status and original submitter
+            result = work.fetchone(f"""
+                SELECT STATUS, SUBMITTED_BY 
+                FROM {Config.TABLE_FILE_SUBMISSIONS} 
+                WHERE ID = %s
+            """, (submission_id,))
+            current_status, original_submitter = result
 
-        # Define workflow transitions
-        status_map = {
-            "Mapper": {
-                "uploaded": "pending_partnership",
-                "performance_complete": "pending_partnership"
-            },
-            "Partnership": {
-                "pending_partnership": "pending_performance"
-            },
-            "Performance": {
-                "pending_performance": "complete"
+            # Define workflow transitions
+            status_map = {
+                "Mapper": {
+                    "uploaded": "pending_partnership",
+                    "performance_complete": "pending_partnership"
+                },
+                "Partnership": {
+                    "pending_partnership": "pending_performance"
+                },
+                "Performance": {
+                    "pending_performance": "complete"
+                }
             }
-        }
-        
-        new_status = status_map.get(account_type, {}).get(current_status)
-        if not new_status:
-            raise ValueError(f"Invalid status transition for {account_type} from {current_status}")
-        
-        # Get next reviewer based on status
-        cur.execute(f"""
-            SELECT USERNAME 
-            FROM {Config.TABLE_USERS} 
-            WHERE ACCOUNT_TYPE = %s 
-            LIMIT 1
-        """, (
-            "Partnership" if new_status == "pending_partnership" else
-            "Performance" if new_status == "pending_performance" else
-            "Mapper" if new_status == "complete" else None,
-        ))
-        
-        next_reviewer_result = cur.fetchone()
-        next_reviewer = next_reviewer_result[0] if next_reviewer_result else None
-
-        # For completed files, set reviewer back to original mapper
-        if new_status == "complete":
-            next_reviewer = original_submitter
-        
-        # Update submission status, submitted_by, and current_reviewer
-        cur.execute(f"""
-            UPDATE {Config.TABLE_FILE_SUBMISSIONS}
-            SET STATUS = %s,
-                CURRENT_REVIEWER = %s,
-                SUBMITTED_BY = %s
-            WHERE ID = %s
-        """, (new_status, next_reviewer, st.session_state.username, submission_id))
-        
-        # Add status history record
-        history_id = str(uuid.uuid4())
-        cur.execute(f"""
-            INSERT INTO {Config.TABLE_STATUS_HISTORY}
-            (ID, SUBMISSION_ID, STATUS, CHANGED_BY, CHANGED_AT)
-            VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
-        """, (history_id, submission_id, new_status, st.session_state.username))
-        
-        # Stage updated file
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"version_{timestamp}.csv"
-        stage_path = stage_file(df, filename, Config.PROCESSED_STAGE)
-        
-        # Create version record
-        version_id = str(uuid.uuid4())
-        cur.execute(f"""
-            INSERT INTO {table_file_versions}
-            (ID, SUBMISSION_ID, VERSION_NUMBER, STAGE_PATH, CREATED_BY, CREATED_AT)
-            SELECT %s, %s, COALESCE(MAX(VERSION_NUMBER), 0) + 1, %s, %s, CURRENT_TIMESTAMP
-            FROM {table_file_versions}
-            WHERE SUBMISSION_ID = %s
-        """, (version_id, submission_id, stage_path, st.session_state.username, submission_id))
-        
-        conn.commit()
+            
+            new_status = status_map.get(account_type, {}).get(current_status)
+            if not new_status:
+                raise ValueError(f"Invalid status transition for {account_type} from {current_status}")
+            
+            # Get next reviewer based on status; completed files go back to the original mapper
+            if new_status == "complete":
+                next_reviewer = original_submitter
+            else:
+                next_reviewer_result = work.fetchone(f"""
+                    SELECT USERNAME 
+                    FROM {Config.TABLE_USERS} 
+                    WHERE ACCOUNT_TYPE = %s 
+                    LIMIT 1
+                """, ("Partnership" if new_status == "pending_partnership" else "Performance",))
+                next_reviewer = next_reviewer_result[0] if next_reviewer_result else None
+            
+            # Stage updated file; the submission id and a random suffix keep concurrent submissions apart
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"version_{submission_id}_{timestamp}_{uuid.uuid4().hex[:8]}.parquet"
+            # Reuse the unit of work's connection; taking a second one from the pool can deadlock it
+            stage_path = stage_file(df, filename, Config.PROCESSED_STAGE, conn=work.conn)
+            
+            # Status update, history record and version record are sent together in one transaction
+            work.execute(f"""
+                UPDATE {Config.TABLE_FILE_SUBMISSIONS}
+                SET STATUS = %s,
+                    CURRENT_REVIEWER = %s,
+                    SUBMITTED_BY = %s
+                WHERE ID = %s
+            """, (new_status, next_reviewer, st.session_state.username, submission_id))
+            
+            history_id = str(uuid.uuid4())
+            work.execute(f"""
+                INSERT INTO {Config.TABLE_STATUS_HISTORY}
+                (ID, SUBMISSION_ID, STATUS, CHANGED_BY, CHANGED_AT)
+                VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+            """, (history_id, submission_id, new_status, st.session_state.username))
+            
+            version_id = str(uuid.uuid4())
+            work.execute(f"""
+                INSERT INTO {table_file_versions}
+                (ID, SUBMISSION_ID, VERSION_NUMBER, STAGE_PATH, CREATED_BY, CREATED_AT)
+                SELECT %s, %s, COALESCE(MAX(VERSION_NUMBER), 0) + 1, %s, %s, CURRENT_TIMESTAMP
+                FROM {table_file_versions}
+                WHERE SUBMISSION_ID = %s
+            """, (version_id, submission_id, stage_path, st.session_state.username, submission_id))
+            
         print(f"File submitted for {new_status} by {st.session_state.username} to reviewer {next_reviewer}")
         
     except Exception as e:
-        conn.rollback()
         print(f"Error submitting for review: {str(e)}")
         raise
-    finally:
-        conn.close()
 
 def archive_file(submission_id):
     """Archive the final processed file"""
-    conn = get_snowflake_connection()
-    try:
+    # Create archive filename with timestamp
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    archive_prefix = f"archived_{submission_id}_{timestamp}"
+    
+    # Copy the latest staged version within the stage when there is one, instead of uploading the data again
+    latest_stage_path = _latest_stage_path(submission_id)
+    if latest_stage_path:
+        stage_path = copy_staged_file(latest_stage_path, Config.ARCHIVE_STAGE, archive_prefix)
+    else:
         # Get the current file data
         file_data = get_file_data(submission_id)
         if file_data is None:
             return False
-            
-        # Create archive filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        archive_filename = f"archived_{submission_id}_{timestamp}.csv"
-        
-        # Upload to archive stage
-        stage_path = stage_file(file_data, archive_filename, Config.ARCHIVE_STAGE)
-        
-        # Update submission record with archive path
-        cur = conn.cursor()
-        cur.execute(f"""
+        stage_path = stage_file(file_data, f"{archive_prefix}.parquet", Config.ARCHIVE_STAGE)
+    
+    # Update submission record with archive path
+    with unit_of_work() as work:
+        work.execute(f"""
             UPDATE {Config.TABLE_FILE_SUBMISSIONS}
             SET ARCHIVE_PATH = %s,
                 ARCHIVED_AT = CURRENT_TIMESTAMP
             WHERE ID = %s
         """, (stage_path, submission_id))
-        
-        conn.commit()
-        return True
-    finally:
-        conn.close()
+    return True
 
 def convert_excel_to_csv(excel_file):
     """Convert Excel file to CSV DataFrame"""
     try:
-        return pd.read_excel(excel_file)
+        return read_xlsx(excel_file)
     except Exception as e:
         st.error(f"Error reading Excel file: {str(e)}")
         return None
 
 def convert_df_to_excel(df):
-    """Convert DataFrame to Excel bytes"""
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False)
-    return output.getvalue()
+    """Convert DataFrame to Excel bytes (constant-memory writer, memoized per DataFrame content)"""
+    return export_bytes(df, 'xlsx')
 
 def download_processed_file(submission_id):
     """Download processed file and archive it"""
@@ -274,8 +331,7 @@ def download_processed_file(submission_id):
 
 def get_comment_count(submission_id):
     """Get the total number of comments for a submission"""
-    conn = get_snowflake_connection()
-    try:
+    with pooled_connection() as conn:
         cur = conn.cursor()
         cur.execute(f"""
             SELECT COUNT(*)
@@ -283,8 +339,6 @@ def get_comment_count(submission_id):
             WHERE SUBMISSION_ID = %s
         """, (submission_id,))
         return cur.fetchone()[0]
-    finally:
-        conn.close()
 
 def download_completed_file(submission_id):
     """Download a completed file and mark it as archived"""
@@ -294,17 +348,13 @@ def download_completed_file(submission_id):
         excel_data = convert_df_to_excel(file_data)
         
         # Get filename and mark as archived
-        conn = get_snowflake_connection()
-        try:
-            cur = conn.cursor()
-            
+        with unit_of_work() as work:
             # Get filename
-            cur.execute(f"""
+            result = work.fetchone(f"""
                 SELECT FILENAME 
                 FROM {Config.TABLE_FILE_SUBMISSIONS}
                 WHERE ID = %s
             """, (submission_id,))
-            result = cur.fetchone()
             filename = result[0] if result else f"completed_{submission_id}.xlsx"
             
             # Add 'completed' prefix if not already present
@@ -319,16 +369,12 @@ def download_completed_file(submission_id):
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             archive_path = f"@{Config.ARCHIVE_STAGE}/archived_{filename}_{timestamp}"
             
-            cur.execute(f"""
+            work.execute(f"""
                 UPDATE {Config.TABLE_FILE_SUBMISSIONS}
                 SET ARCHIVED = TRUE,
                     ARCHIVED_AT = CURRENT_TIMESTAMP,
                     ARCHIVE_PATH = %s
                 WHERE ID = %s
             """, (archive_path, submission_id))
-            
-            conn.commit()
-            return excel_data, filename
-        finally:
-            conn.close()
-    return None, None
\ No newline at end of file
+        return excel_data, filename
+    return None, None
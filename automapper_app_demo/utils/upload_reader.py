@@ -0,0 +1,153 @@
+import pandas as pd
+import os
+import logging
+from openpyxl import load_workbook
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+logger = logging.getLogger(__name__)
+
+# Rows read, cleaned and predicted at a time
+CHUNK_SIZE = int(os.getenv('PROCESS_CHUNK_SIZE', '5000'))
+
+# Columns the mapping pipeline reads; other columns are only carried through to the output
+PIPELINE_COLUMNS = ['Campaign', 'Placement Name', 'DCM Campaign Name', 'Media ID']
+
+# Columns the UI reads from uploads: everything by default, or only PIPELINE_COLUMNS
+# when UPLOAD_PIPELINE_COLUMNS_ONLY=1 (faster parsing, other columns are dropped from the output)
+UPLOAD_COLUMNS = PIPELINE_COLUMNS if os.getenv('UPLOAD_PIPELINE_COLUMNS_ONLY', '0') == '1' else None
+
+# 'calamine' (default when python-calamine is installed) or 'openpyxl'
+XLSX_ENGINE = os.getenv('XLSX_ENGINE', 'calamine' if CalamineWorkbook is not None else 'openpyxl')
+
+def _file_type(name):
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith('.xlsx'):
+        return 'xlsx'
+    raise ValueError("Unsupported file type. Please upload a CSV or XLSX file.")
+
+# Pipeline columns are always read as text, so every chunk gets the same dtype (and Media ID
+# formatting) no matter which values, or how many missing ones, that chunk happens to hold
+_TEXT_DTYPES = {col: str for col in PIPELINE_COLUMNS}
+
+def _cells_frame(rows, names):
+    """DataFrame of sheet cell values with the pipeline columns as text and the other dtypes inferred"""
+    df = pd.DataFrame(rows, columns=names, dtype=object)
+    for i, name in enumerate(names):
+        values = df.iloc[:, i]
+        if name in PIPELINE_COLUMNS:
+            df.isetitem(i, values.where(values.isna(), values.map(str, na_action='ignore')))
+        else:
+            df.isetitem(i, values.infer_objects())
+    return df
+
+def iter_csv_chunks(file, chunk_size=CHUNK_SIZE, columns=None):
+    usecols = (lambda col: col in columns) if columns is not None else None
+    yield from pd.read_csv(file, chunksize=chunk_size, usecols=usecols, dtype=_TEXT_DTYPES)
+
+def _calamine_cell(value):
+    # Excel stores every number as a float; match openpyxl so Media IDs don't gain a '.0'
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if value == '':
+        return None
+    return value
+
+def _calamine_rows(file):
+    """Open the first sheet with calamine up front (so unreadable files fail here), then yield rows one at a time"""
+    if hasattr(file, 'read'):
+        workbook = CalamineWorkbook.from_filelike(file)
+    else:
+        workbook = CalamineWorkbook.from_path(file)
+    sheet = workbook.get_sheet_by_index(0)
+    # iter_rows converts one row at a time instead of building every row as Python lists;
+    # it starts at the first used column, so pad back to column A like openpyxl
+    padding = [None] * sheet.start[1] if sheet.start else []
+    return (padding + [_calamine_cell(value) for value in row] for row in sheet.iter_rows())
+
+def _openpyxl_rows(file):
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def _chunk_rows(rows, chunk_size, columns=None):
+    """Turn header + row tuples into DataFrame chunks, optionally keeping only the given columns"""
+    header = next(rows, None)
+    if header is None:
+        return
+    names = [str(col) if col is not None else f"Unnamed: {i}" for i, col in enumerate(header)]
+    positions = list(range(len(names)))
+    if columns is not None:
+        positions = [i for i, name in enumerate(names) if name in columns]
+        names = [names[i] for i in positions]
+    width = len(header)
+
+    batch = []
+    for row in rows:
+        # Sheets can return ragged rows
+        row = tuple(row[:width]) + (None,) * (width - len(row))
+        batch.append([row[i] for i in positions])
+        if len(batch) == chunk_size:
+            yield _cells_frame(batch, names)
+            batch = []
+    if batch:
+        yield _cells_frame(batch, names)
+
+def iter_xlsx_chunks(file, chunk_size=CHUNK_SIZE, columns=None, engine=None):
+    """
+    Stream the first sheet of a workbook in chunk_size-row DataFrames. Uses calamine
+    when available and falls back to openpyxl if it can't read the file.
+    """
+    engine = engine or XLSX_ENGINE
+    if engine == 'calamine' and CalamineWorkbook is not None:
+        try:
+            rows = _calamine_rows(file)
+        except Exception as e:
+            logger.warning(f"calamine could not read the workbook ({str(e)}), falling back to openpyxl")
+            if hasattr(file, 'seek'):
+                file.seek(0)
+            rows = _openpyxl_rows(file)
+    else:
+        rows = _openpyxl_rows(file)
+    yield from _chunk_rows(rows, chunk_size, columns)
+
+def iter_file_chunks(file, name, chunk_size=CHUNK_SIZE, columns=None):
+    """
+    Yield the upload as DataFrame chunks; file may be a path or a file-like object.
+    Pass columns=PIPELINE_COLUMNS to skip parsing columns the pipeline doesn't use.
+    """
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    if _file_type(name) == 'csv':
+        return iter_csv_chunks(file, chunk_size, columns)
+    return iter_xlsx_chunks(file, chunk_size, columns)
+
+def read_xlsx(file, columns=None, engine=None):
+    """Read a whole workbook's first sheet through the same engines as the chunked path"""
+    chunks = list(iter_xlsx_chunks(file, columns=columns, engine=engine))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+def estimate_row_count(file, name):
+    """Cheap data-row count used only for progress reporting"""
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    if _file_type(name) == 'csv':
+        if hasattr(file, 'read'):
+            count = sum(block.count(b'\n') for block in iter(lambda: file.read(1024 * 1024), b''))
+            file.seek(0)
+        else:
+            with open(file, 'rb') as f:
+                count = sum(block.count(b'\n') for block in iter(lambda: f.read(1024 * 1024), b''))
+        return max(count - 1, 0)
+
+    workbook = load_workbook(file, read_only=True)
+    try:
+        return max((workbook.worksheets[0].max_row or 1) - 1, 0)
+    finally:
+        workbook.close()
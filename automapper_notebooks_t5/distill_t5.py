@@ -0,0 +1,207 @@
+"""Distill the fine-tuned T5-base mapper into a t5-small sized student.
+
+Uses the same master_data.csv, prompt/target format and train/validation/test
+split as automapper_t5_training.ipynb. The student is trained on the gold
+targets plus the teacher's softened token distributions:
+
+    loss = alpha * cross_entropy(student, gold) + (1 - alpha) * T^2 * KL(teacher_T || student_T)
+
+The test split is written next to the student so the tiers can be evaluated
+with automapper_app_demo/benchmarks/evaluate_tiers.py.
+
+Requires transformers>=4.46 (eval_strategy and Trainer(processing_class=...)),
+which also satisfies automapper_app_demo/requirements.txt, plus accelerate and datasets.
+
+Usage:
+    python distill_t5.py --teacher-dir ../automapper_app_demo/model_outputs --output-dir ./model_outputs_student
+"""
+import argparse
+import os
+import random
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
+from transformers import (
+    T5Tokenizer,
+    T5ForConditionalGeneration,
+    Seq2SeqTrainer,
+    Seq2SeqTrainingArguments,
+    DataCollatorForSeq2Seq
+)
+from datasets import Dataset
+from sklearn.model_selection import train_test_split
+
+FIELD_COLUMNS = {
+    'Placement Group': 'PLACEMENT_GROUP',
+    'Publisher': 'PUBLISHER',
+    'Tactic': 'TACTIC',
+    'Audience': 'AUDIENCE',
+    'Ad Type': 'AD_TYPE'
+}
+
+def load_splits(data_path, seed):
+    """Same cleaning, prompts, targets and 80/10/10 split as the training notebook"""
+    df = pd.read_csv(data_path, encoding='latin')
+    df.columns = df.columns.str.strip().str.upper().str.replace(r'\s+', '_', regex=True)
+
+    required_columns = ['CAMPAIGN', 'PUBLISHER', 'PLACEMENT_NAME', 'PLACEMENT_GROUP', 'TACTIC', 'AUDIENCE', 'AD_TYPE']
+    df = df.dropna(subset=required_columns).reset_index(drop=True)
+    df_rel = df[required_columns].copy()
+
+    df_rel['placement_info'] = (
+        "Campaign: " + df_rel['CAMPAIGN'].astype(str) + ", Placement Name: " + df_rel['PLACEMENT_NAME'].astype(str)
+    )
+    df_rel['target_text'] = (
+        "Placement Group: " + df_rel['PLACEMENT_GROUP'].astype(str)
+        + "; Publisher: " + df_rel['PUBLISHER'].astype(str)
+        + "; Tactic: " + df_rel['TACTIC'].astype(str)
+        + "; Audience: " + df_rel['AUDIENCE'].astype(str)
+        + "; Ad Type: " + df_rel['AD_TYPE'].astype(str)
+    )
+
+    train_df, temp_df = train_test_split(df_rel, test_size=0.2, random_state=seed)
+    val_df, test_df = train_test_split(temp_df, test_size=0.5, random_state=seed)
+    return train_df.reset_index(drop=True), val_df.reset_index(drop=True), test_df.reset_index(drop=True)
+
+class DistillationTrainer(Seq2SeqTrainer):
+    """Seq2SeqTrainer whose loss mixes gold cross-entropy with KL to a frozen teacher"""
+
+    def __init__(self, *args, teacher=None, alpha=0.5, temperature=2.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.teacher = teacher
+        self.alpha = alpha
+        self.temperature = temperature
+
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        outputs = model(**inputs)
+        with torch.no_grad():
+            teacher_logits = self.teacher(**inputs).logits
+
+        mask = inputs['labels'] != -100
+        t = self.temperature
+        kl = F.kl_div(
+            F.log_softmax(outputs.logits / t, dim=-1),
+            F.softmax(teacher_logits / t, dim=-1),
+            reduction='none'
+        ).sum(dim=-1)
+        kl = (kl * mask).sum() / mask.sum().clamp(min=1) * t * t
+
+        loss = self.alpha * outputs.loss + (1 - self.alpha) * kl
+        return (loss, outputs) if return_outputs else loss
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='./master_data.csv')
+    parser.add_argument('--teacher-dir', required=True, help="Fine-tuned T5-base mapper")
+    parser.add_argument('--student-model', default='t5-small', help="Pretrained checkpoint the student starts from")
+    parser.add_argument('--output-dir', default='./model_outputs_student')
+    parser.add_argument('--epochs', type=int, default=8)
+    parser.add_argument('--alpha', type=float, default=0.5, help="Weight of the gold cross-entropy term")
+    parser.add_argument('--temperature', type=float, default=2.0)
+    args = parser.parse_args()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    print(f"Using device: {device}")
+
+    # Model parameters, matching the teacher's training run where they apply
+    model_params = {
+        "TRAIN_BATCH_SIZE": 32,
+        "VALID_BATCH_SIZE": 32,
+        "LEARNING_RATE": 3e-4,  # small T5 models train well at a higher rate than t5-base
+        "MAX_SOURCE_TEXT_LENGTH": 200,
+        "MAX_TARGET_TEXT_LENGTH": 128,
+        "SEED": 42,
+    }
+
+    torch.manual_seed(model_params["SEED"])
+    np.random.seed(model_params["SEED"])
+    random.seed(model_params["SEED"])
+    torch.backends.cudnn.deterministic = True
+
+    train_df, val_df, test_df = load_splits(args.data, model_params["SEED"])
+    print(f"Train {len(train_df)}, validation {len(val_df)}, test {len(test_df)} rows")
+
+    # The student shares the teacher's tokenizer, so logits line up token for token
+    tokenizer = T5Tokenizer.from_pretrained(args.teacher_dir)
+    teacher = T5ForConditionalGeneration.from_pretrained(args.teacher_dir).to(device)
+    teacher.eval()
+    for param in teacher.parameters():
+        param.requires_grad = False
+    student = T5ForConditionalGeneration.from_pretrained(args.student_model)
+    student.resize_token_embeddings(teacher.config.vocab_size)
+    student.to(device)
+    print(f"Teacher {teacher.num_parameters() / 1e6:.0f}M parameters, student {student.num_parameters() / 1e6:.0f}M")
+
+    def preprocess_function(examples):
+        model_inputs = tokenizer(
+            examples['placement_info'],
+            max_length=model_params["MAX_SOURCE_TEXT_LENGTH"],
+            truncation=True,
+        )
+        labels = tokenizer(
+            text_target=examples['target_text'],
+            max_length=model_params["MAX_TARGET_TEXT_LENGTH"],
+            truncation=True,
+        )
+        model_inputs["labels"] = labels["input_ids"]
+        return model_inputs
+
+    def tokenize(df):
+        dataset = Dataset.from_pandas(df[['placement_info', 'target_text']])
+        return dataset.map(preprocess_function, batched=True, remove_columns=dataset.column_names)
+
+    data_collator = DataCollatorForSeq2Seq(
+        tokenizer=tokenizer,
+        model=student,
+        padding=True,
+        label_pad_token_id=-100,
+    )
+
+    training_args = Seq2SeqTrainingArguments(
+        output_dir=args.output_dir,
+        num_train_epochs=args.epochs,
+        per_device_train_batch_size=model_params["TRAIN_BATCH_SIZE"],
+        per_device_eval_batch_size=model_params["VALID_BATCH_SIZE"],
+        learning_rate=model_params["LEARNING_RATE"],
+        eval_strategy='epoch',
+        save_strategy='epoch',
+        fp16=torch.cuda.is_available(),
+        logging_steps=10,
+        save_total_limit=2,
+        load_best_model_at_end=True,
+        push_to_hub=False,
+        report_to="none",
+        gradient_accumulation_steps=2,
+    )
+
+    trainer = DistillationTrainer(
+        model=student,
+        args=training_args,
+        train_dataset=tokenize(train_df),
+        eval_dataset=tokenize(val_df),
+        processing_class=tokenizer,
+        data_collator=data_collator,
+        teacher=teacher,
+        alpha=args.alpha,
+        temperature=args.temperature,
+    )
+    trainer.train()
+
+    trainer.save_model(args.output_dir)
+    tokenizer.save_pretrained(args.output_dir)
+    print(f"Evaluation results: {trainer.evaluate()}")
+
+    # Held-out rows in the upload format, with the gold fields to score against
+    test_split = pd.DataFrame({
+        'Campaign': test_df['CAMPAIGN'],
+        'Placement Name': test_df['PLACEMENT_NAME'],
+        **{field: test_df[col] for field, col in FIELD_COLUMNS.items()}
+    })
+    test_path = os.path.join(args.output_dir, 'test_split.csv')
+    test_split.to_csv(test_path, index=False)
+    print("Student saved to:", args.output_dir)
+    print("Test split saved to:", test_path)
+
+if __name__ == "__main__":
+    main()